@@ -0,0 +1,436 @@
+"""
+Benchmarks of the board models and the search engines.
+
+Every benchmark times one operation on a fixed set of positions of one side
+length, from 3 to 8: the positions of test/test_board.py of that size and
+positions generated from a fixed seed.  It records the best time per call of
+several runs, the number of search nodes per second for the searches, the
+objects one call retains and its peak memory.  Retained objects are the net
+number of objects tracked by the garbage collector that a call leaves behind,
+its result included.  Objects allocated and freed during the call do not
+count: Python 2 offers no way to count allocations.  Peak memory is how much
+one call raises the peak resident set size of a fresh process running only
+that benchmark, to the page.  Memory the process freed while starting up is
+reused first, so benchmarks that need little memory read 0.  It is not
+measured (C{None}) where the resource module is missing, as on Windows.
+
+To run the suite and save the results, from the base directory:
+    PYTHONPATH=. python bench/suite.py
+
+To compare with saved results, reporting every benchmark that became more
+than 10% slower or needs over 10% more memory, and exiting with status 1 if
+there is one:
+    PYTHONPATH=. python bench/suite.py --compare baseline.json
+"""
+
+import gc
+import json
+import os
+import sys
+from argparse import SUPPRESS
+from argparse import ArgumentParser
+from random import Random
+from subprocess import check_output
+from timeit import default_timer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from common import config
+from common.model import bitboard
+from common.model import board
+from server.ai import minimax
+from server.ai.evaluation import evaluator
+from server.ai.ordering import MoveOrderer
+from server.ai.transposition import TranspositionTable
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'test'))
+from test_board import board_string_list
+
+# The side lengths benchmarked.
+SIDE_LENS = range(3, 9)
+
+# The number of generated positions of each side length.
+GENERATED = 6
+
+# The seed of the generated positions.
+SEED = 1
+
+# The minimum duration in seconds of one timed run of a benchmark.
+MIN_RUN_TIME = 0.05
+
+# The number of timed runs of a benchmark, of which the fastest counts.
+RUNS = 5
+
+# The depth searched by the search engine benchmarks of each side length.
+SEARCH_DEPTHS = {3: 9, 4: 4, 5: 3, 6: 2, 7: 2, 8: 2}
+
+# The capacity of the transposition tables of the search benchmarks, small
+# enough that building one per position stays out of the measured time; a
+# table of config.tt_bytes takes milliseconds to allocate.
+SEARCH_TT_CAPACITY = 2 ** 14
+
+# The default file the results are saved to.
+DEFAULT_OUTPUT = 'bench_results.json'
+
+# The default slowdown, as a fraction, reported as a regression.
+DEFAULT_THRESHOLD = 0.1
+
+# The fields of the results compared with a baseline, each with the smallest
+# increase that counts as a regression whatever the ratio, so that the noise
+# of small values is not reported.
+COMPARED_FIELDS = [
+    ('seconds', 0),
+    ('retained_objects', 100),
+    ('peak_bytes', 256 * 1024),
+]
+
+# The bytes of the unit of ru_maxrss: kilobytes, but bytes on OS X.
+MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+def positions(side_len):
+    """
+    Return the benchmark positions of a side length.
+
+    @param side_len: the side length.
+    @type side_len: C{int}
+
+    @return: the positions of test/test_board.py of this size, followed by
+        games played randomly from a fixed seed and stopped at between a
+        quarter and three quarters of the cells, before they were over.
+    @rtype: C{list} of C{str}
+    """
+    size = side_len ** 2
+    strings = [string for string in board_string_list if len(string) == size]
+    random = Random(SEED * 100 + side_len)
+    while len(strings) < GENERATED + 1:
+        position = bitboard.blank(side_len)
+        for move in random.sample(range(size), random.randint(
+                size // 4, size * 3 // 4)):
+            position.play(move)
+            if position.is_win_at(move):
+                position.undo(move)
+                break
+        strings.append(bitboard.to_string(position))
+    return strings
+
+def time_call(func):
+    """
+    Time a function, calling it repeatedly.
+
+    @param func: the function, called without arguments.
+    @type func: C{function}
+
+    @return: the fastest time in seconds of one call.
+    @rtype: C{float}
+    """
+    number = 1
+    while True:
+        start = default_timer()
+        for _ in range(number):
+            func()
+        elapsed = default_timer() - start
+        if elapsed >= MIN_RUN_TIME:
+            break
+        number *= 2
+    best = elapsed
+    for _ in range(RUNS - 1):
+        start = default_timer()
+        for _ in range(number):
+            func()
+        best = min(best, default_timer() - start)
+    return best / number
+
+def count_retained(func):
+    """
+    Count the objects retained by one call of a function.
+
+    @param func: the function, called without arguments.
+    @type func: C{function}
+
+    @return: the retained objects, see the module docstring.
+    @rtype: C{int}
+    """
+    enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        # With collection disabled the generation 0 count is the number of
+        # tracked objects allocated less those freed.
+        before = gc.get_count()[0]
+        result = func()
+        retained = gc.get_count()[0] - before
+    finally:
+        if enabled:
+            gc.enable()
+    del result
+    return retained
+
+def measure_peak(key):
+    """
+    Measure the peak memory of one call of a benchmark in a fresh process.
+
+    @param key: the key of the benchmark, '<benchmark>/<side length>'.
+    @type key: C{str}
+
+    @return: the peak memory in bytes, see the module docstring, or C{None}
+        if it cannot be measured.
+    @rtype: C{int}
+    """
+    if resource is None:
+        return None
+    return int(check_output([sys.executable, os.path.abspath(__file__),
+        '--peak', key]))
+
+def peak_in_process(key):
+    """
+    Measure the peak memory of one call of a benchmark in this process, which
+    must have run nothing else.  Called by L{measure_peak} in the child.
+
+    @param key: the key of the benchmark, '<benchmark>/<side length>'.
+    @type key: C{str}
+
+    @return: the peak memory in bytes.
+    @rtype: C{int}
+    """
+    name, side_len = key.rsplit('/', 1)
+    func = dict([(bench_name, bench_func) for bench_name, bench_func, _
+        in benchmarks(int(side_len))])[name]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func()
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (after - before) * MAXRSS_UNIT
+
+def benchmark(key, func, count_nodes=None):
+    """
+    Run one benchmark.
+
+    @param key: the key of the benchmark, '<benchmark>/<side length>'.
+    @type key: C{str}
+
+    @param func: runs the operation on every position.
+    @type func: C{function}
+
+    @param count_nodes: returns the number of nodes one call of func searches,
+        for search benchmarks.
+    @type count_nodes: C{function}
+
+    @return: the result, a C{dict} with the seconds per call, the
+        retained_objects and peak_bytes of a call and, for searches, the nodes
+        and nodes_per_second.
+    @rtype: C{dict}
+    """
+    result = {
+        'seconds': time_call(func),
+        'retained_objects': count_retained(func),
+        'peak_bytes': measure_peak(key),
+    }
+    if count_nodes is not None:
+        nodes = count_nodes()
+        result['nodes'] = nodes
+        result['nodes_per_second'] = nodes / result['seconds']
+    return result
+
+def count_alpha_beta(boards):
+    """
+    Count the positions visited by L{minimax.alpha_beta} on the given boards.
+    """
+    calls = [0]
+    alpha_beta = minimax.alpha_beta
+    def counted(*args, **kwargs):
+        calls[0] += 1
+        return alpha_beta(*args, **kwargs)
+    minimax.alpha_beta = counted
+    try:
+        for position in boards:
+            alpha_beta(position)
+    finally:
+        minimax.alpha_beta = alpha_beta
+    # The calls made from the outside are not counted by the wrapper.
+    return calls[0] + len(boards)
+
+def search_all(strings, depth):
+    """
+    Search every position with a fresh L{minimax.Search} as the server would,
+    each with a new table of SEARCH_TT_CAPACITY slots.
+
+    @return: the number of nodes searched.
+    @rtype: C{int}
+    """
+    nodes = 0
+    for string in strings:
+        position = bitboard.from_string(string)
+        search = minimax.Search(position, depth,
+            TranspositionTable(SEARCH_TT_CAPACITY, config.tt_policy),
+            orderer=MoveOrderer(position.side_len()),
+            vectorized=minimax.VECTORIZED,
+            evaluator=evaluator(position, config.heuristic))
+        search.run()
+        nodes += search.nodes
+    return nodes
+
+def benchmarks(side_len):
+    """
+    Return the benchmarks of a side length.
+
+    @param side_len: the side length.
+    @type side_len: C{int}
+
+    @return: the name, function and node counting function of each benchmark.
+    @rtype: C{list} of C{tuple}
+    """
+    strings = positions(side_len)
+    # The searches skip finished games.
+    open_strings = [string for string in strings
+        if not bitboard.from_string(string).is_leaf_and_score()[0]]
+    result = []
+    for name, module in [('board', board), ('bitboard', bitboard)]:
+        boards = [module.from_string(string) for string in strings]
+        open_boards = [module.from_string(string) for string in open_strings]
+        result += [
+            (name + '.from_string',
+                lambda module=module: [
+                    module.from_string(string) for string in strings],
+                None),
+            (name + '.to_string',
+                lambda module=module, boards=boards: [
+                    module.to_string(position) for position in boards],
+                None),
+            (name + '.children',
+                lambda boards=boards: [
+                    position.children() for position in boards],
+                None),
+            (name + '.is_win',
+                lambda boards=boards: [
+                    position.is_win() for position in boards],
+                None),
+            (name + '.heur_score',
+                lambda boards=boards: [
+                    position.heur_score() for position in boards],
+                None),
+        ]
+        if name == 'board':
+            result.append(('alpha_beta',
+                lambda boards=open_boards: [
+                    minimax.alpha_beta(position) for position in boards],
+                lambda boards=open_boards: count_alpha_beta(boards)))
+    depth = SEARCH_DEPTHS[side_len]
+    result.append(('search',
+        lambda: search_all(open_strings, depth),
+        lambda: search_all(open_strings, depth)))
+    return result
+
+def run(side_lens=SIDE_LENS, only=None):
+    """
+    Run the benchmarks.
+
+    @param side_lens: the side lengths to benchmark.
+    @type side_lens: C{list} of C{int}
+
+    @param only: if given, only the benchmarks whose name contains it.
+    @type only: C{str}
+
+    @return: the results keyed by '<benchmark>/<side length>'.
+    @rtype: C{dict}
+    """
+    results = {}
+    for side_len in side_lens:
+        for name, func, count_nodes in benchmarks(side_len):
+            if only is not None and only not in name:
+                continue
+            key = '{0}/{1}'.format(name, side_len)
+            results[key] = benchmark(key, func, count_nodes)
+            report(key, results[key])
+    return results
+
+def report(key, result):
+    """
+    Print the result of one benchmark.
+    """
+    line = '{0:<24} {1:>12.1f} us {2:>9} retained {3:>12} peak bytes'.format(
+        key, result['seconds'] * 1e6, result['retained_objects'],
+        result['peak_bytes'])
+    if 'nodes_per_second' in result:
+        line += ' {0:>10.0f} nodes/s'.format(result['nodes_per_second'])
+    print(line)
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Find the benchmarks that became slower or need more memory than in a
+    baseline.
+
+    @param results: results returned by L{run}.
+    @type results: C{dict}
+
+    @param baseline: earlier results.
+    @type baseline: C{dict}
+
+    @param threshold: the increase, as a fraction, that counts as a
+        regression.
+    @type threshold: C{float}
+
+    @return: the key, the field of COMPARED_FIELDS and the ratio of the new
+        value to the baseline value of every regression, the worst first.
+        Fields missing or not measured on either side are skipped.
+    @rtype: C{list} of C{tuple} of C{str}, C{str} and C{float}
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for field, min_increase in COMPARED_FIELDS:
+            new, old = result.get(field), baseline[key].get(field)
+            if new is None or old is None or new - old <= min_increase:
+                continue
+            ratio = float(new) / old if old > 0 else float('inf')
+            if ratio > 1 + threshold:
+                regressions.append((key, field, ratio))
+    return sorted(regressions, key=lambda regression: -regression[2])
+
+def main(argv=None):
+    """
+    Run the suite from the command line.
+
+    @return: the exit status: 1 if a regression was found, 0 otherwise.
+    @rtype: C{int}
+    """
+    parser = ArgumentParser(description='Benchmark the boards and searches.')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+        help='the file to save the results to (default: %(default)s)')
+    parser.add_argument('--compare', metavar='BASELINE',
+        help='results saved earlier to compare with')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help='the slowdown reported as a regression (default: %(default)s)')
+    parser.add_argument('--side-len', type=int, action='append',
+        help='a side length to benchmark (default: 3 to 8)')
+    parser.add_argument('--only',
+        help='only run the benchmarks whose name contains this')
+    # Run by measure_peak in a fresh process.
+    parser.add_argument('--peak', help=SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.peak is not None:
+        print(peak_in_process(args.peak))
+        return 0
+
+    results = run(args.side_len or SIDE_LENS, args.only)
+    with open(args.output, 'w') as output:
+        json.dump({'python': sys.version.split()[0], 'results': results},
+            output, indent=2, sort_keys=True)
+    print('Saved results to {0}'.format(args.output))
+
+    if args.compare is None:
+        return 0
+    with open(args.compare) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+    regressions = compare(results, baseline, args.threshold)
+    for key, field, ratio in regressions:
+        print('REGRESSION {0:<24} {1:<16} {2:.2f}x'.format(key, field, ratio))
+    if not regressions:
+        print('No regressions against {0}'.format(args.compare))
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Chooses where the computers moves are searched: in the client process or by
+the server.
+
+The local engine is the servers own search, L{server.ai.minimax.best_move},
+run on a worker thread so the UI never blocks; the result is handed back to
+the Kivy main loop with C{Clock.schedule_once}.  Single-user play then needs
+no server process.
+
+config.engine picks 'local', 'remote' or 'auto'.  In 'auto' mode boards up to
+config.local_max_side_len are searched locally and larger ones remotely, the
+server having worker processes and warm tables, until the latency of both has
+been measured for a side length; from then on the faster one is used.  Every
+PROBE_INTERVAL moves of a side length the other engine is used instead, so
+that both get measured and a change in their speed is noticed.  An engine
+that fails counts as infinitely slow for FAILURE_EXPIRY seconds, so the client
+falls back to the local engine while the server is unreachable, and the
+move is asked of the other engine.
+"""
+
+from Queue import Queue
+from threading import Thread
+from time import time
+
+from kivy.clock import Clock
+
+from common import config
+from common.log import ModuleLogger
+from common.model import bitboard
+from server.ai.minimax import best_move
+
+# Logs as this module.
+logger = ModuleLogger()
+
+# The values of config.engine.
+LOCAL = 'local'
+REMOTE = 'remote'
+AUTO = 'auto'
+
+# The weight of the newest sample in the moving average of the latencies.
+SMOOTHING = 0.3
+
+# Every this many moves of a side length, the engine not chosen otherwise is
+# used instead.
+PROBE_INTERVAL = 8
+
+# The seconds after which a failed engine is considered unmeasured again.
+FAILURE_EXPIRY = 60.0
+
+class Latencies(object):
+    """
+    Moving averages of the time taken to get a move.
+
+    @ivar averages: the average in seconds keyed by engine and side length.
+    @type averages: C{dict}
+
+    @ivar failures: the time of the last failure, keyed as averages, of the
+        engines whose average is infinite.
+    @type failures: C{dict}
+    """
+
+    def __init__(self):
+        """
+        Construct empty L{Latencies}.
+        """
+        self.averages = {}
+        self.failures = {}
+
+    def record(self, engine, side_len, seconds):
+        """
+        Record the time taken to get a move.
+
+        @param engine: L{LOCAL} or L{REMOTE}.
+        @type engine: C{str}
+
+        @param side_len: the side length of the board.
+        @type side_len: C{int}
+
+        @param seconds: the time taken, C{float('inf')} for a failure.
+        @type seconds: C{float}
+        """
+        key = engine, side_len
+        average = self.averages.get(key)
+        if seconds == float('inf'):
+            self.failures[key] = time()
+        else:
+            self.failures.pop(key, None)
+        if average is None or seconds == float('inf') \
+                or average == float('inf'):
+            self.averages[key] = seconds
+        else:
+            self.averages[key] = average + SMOOTHING * (seconds - average)
+
+    def get(self, engine, side_len):
+        """
+        Return the average time taken to get a move.
+
+        @return: the average in seconds, or C{None} if none was recorded or
+            the engine last failed over FAILURE_EXPIRY seconds ago.
+        @rtype: C{float}
+        """
+        key = engine, side_len
+        failed = self.failures.get(key)
+        if failed is not None and time() - failed > FAILURE_EXPIRY:
+            del self.failures[key]
+            del self.averages[key]
+        return self.averages.get(key)
+
+# The latencies measured so far.
+latencies = Latencies()
+
+# The boards waiting for the local engine thread, see L{get_local_move}.
+_requests = Queue()
+
+# The local engine thread, started on first use.
+_thread = None
+
+# The number of moves chosen for, keyed by side length.
+_moves = {}
+
+def choose(side_len):
+    """
+    Choose the engine to search a board with.
+
+    @param side_len: the side length of the board.
+    @type side_len: C{int}
+
+    @return: L{LOCAL} or L{REMOTE}.
+    @rtype: C{str}
+    """
+    if config.engine != AUTO:
+        return config.engine
+    local = latencies.get(LOCAL, side_len)
+    remote = latencies.get(REMOTE, side_len)
+    if local is not None and remote is not None:
+        engine = LOCAL if local <= remote else REMOTE
+    elif remote == float('inf'):
+        engine = LOCAL
+    elif local == float('inf'):
+        engine = REMOTE
+    else:
+        engine = LOCAL if side_len <= config.local_max_side_len else REMOTE
+    _moves[side_len] = _moves.get(side_len, 0) + 1
+    if _moves[side_len] % PROBE_INTERVAL == 0:
+        return REMOTE if engine == LOCAL else LOCAL
+    return engine
+
+def get_local_move(board_string, on_board, on_failure):
+    """
+    Search for the computers move on the local engine thread.
+
+    @param board_string: the board.
+    @type board_string: C{str}
+
+    @param on_board: called on the Kivy main thread with the string of the
+        board after the computers move.
+    @type on_board: C{function}
+
+    @param on_failure: called on the Kivy main thread with the error if the
+        search fails.
+    @type on_failure: C{function}
+    """
+    global _thread
+    if _thread is None:
+        _thread = Thread(target=serve, name='local-engine')
+        _thread.daemon = True
+        _thread.start()
+    _requests.put((board_string, on_board, on_failure, time()))
+
+def serve():
+    """
+    Search the boards passed to L{get_local_move}, one at a time.  Run by the
+    local engine thread, whose transposition table is kept between moves as
+    the servers are.
+    """
+    while True:
+        board_string, on_board, on_failure, start = _requests.get()
+        side_len = int(len(board_string) ** 0.5)
+        try:
+            result = bitboard.to_string(
+                best_move(bitboard.from_string(board_string)))
+        except Exception as error:
+            logger.err('Local search failed: {error}', error=error)
+            latencies.record(LOCAL, side_len, float('inf'))
+            Clock.schedule_once(lambda dt, error=error, on_failure=on_failure:
+                on_failure(error))
+            continue
+        latencies.record(LOCAL, side_len, time() - start)
+        Clock.schedule_once(lambda dt, result=result, on_board=on_board:
+            on_board(result))
+
+def remote_callbacks(board_string, on_board, on_failure):
+    """
+    Return the callbacks of a remote request for a board, timing it and
+    falling back to the local engine if it fails.
+
+    @param board_string: the board.
+    @type board_string: C{str}
+
+    @param on_board: called with the request and the string of the board
+        after the computers move, as L{client.controller.game.on_new_board}.
+    @type on_board: C{function}
+
+    @param on_failure: called with the error if the local engine fails too.
+    @type on_failure: C{function}
+
+    @return: the success and the failure callbacks.
+    @rtype: C{tuple} of C{function}
+    """
+    side_len = int(len(board_string) ** 0.5)
+    start = time()
+
+    def on_success(req, resp):
+        latencies.record(REMOTE, side_len, time() - start)
+        on_board(req, resp)
+
+    def on_remote_failure(req, error):
+        logger.warn('Remote search failed, searching locally: {error}',
+            error=error)
+        latencies.record(REMOTE, side_len, float('inf'))
+        get_local_move(board_string, lambda result: on_board(req, result),
+            on_failure)
+
+    return on_success, on_remote_failure
@@ -6,7 +6,11 @@ from kivy.app import App
 from kivy.network.urlrequest import UrlRequest
 
 from common import config
+from common import wire
+from common.model import bitboard
 from common.model import board
+from client.controller import engine
+from client.controller import session
 from client.model import game
 from client.uix.popup import GameOverPopup
 from client.util.query import find
@@ -78,14 +82,25 @@ def on_new_board(req, resp):
         game.losses += 1
         GameOverPopup(title='You Lose').open()
 
+def on_move_failed(error):
+    """
+    Handle the failure of both engines to find a move by ending the game.
+
+    @param error: the error of the last engine tried.
+    """
+    find('board_screen').mouse_enabled = True
+    GameOverPopup(title='No move found').open()
+
 def get_move(old_board):
     """
-    Get the servers next move.
+    Get the computers next move, from the local engine or the server as
+    L{engine.choose} decides.
 
     @param old_board: the board for which to calculate the best move from.
     @type old_board: L{Board}
     """
     find('board_screen').mouse_enabled = False
+    board_string = board.to_string(old_board)
 
     def build_url():
         """
@@ -95,9 +110,67 @@ def get_move(old_board):
         The URI host and port are configured in config.py.
         """
         return 'http://' + config.host + ':' + str(config.port) + '/?' + \
-            urlencode({'board': board.to_string(old_board)})
+            urlencode({'board': board_string})
+
+    def get_remote_move(on_success, on_failure):
+        def get_text_move():
+            UrlRequest(url=build_url(), on_success=on_success,
+                on_error=on_failure, on_failure=on_failure)
+
+        if config.wire_format == 'session':
+            session.get_move(old_board,
+                lambda new_board_string: on_success(None, new_board_string),
+                get_text_move)
+        elif config.wire_format == 'packed':
+            get_packed_move(old_board, on_success, on_failure)
+        else:
+            get_text_move()
+
+    if engine.choose(old_board.side_len()) == engine.LOCAL:
+        # Should the server fail too after the local engine has, the local
+        # engine is not tried again.
+        engine.get_local_move(board_string,
+            lambda new_board_string: on_new_board(None, new_board_string),
+            lambda error: get_remote_move(on_new_board,
+                lambda req, error: on_move_failed(error)))
+    else:
+        get_remote_move(*engine.remote_callbacks(
+            board_string, on_new_board, on_move_failed))
+
+def get_packed_move(old_board, on_success, on_failure):
+    """
+    Get the servers next move in the compact binary format of L{common.wire}.
 
-    UrlRequest(url=build_url(), on_success=on_new_board)
+    The board is posted as 2 bits per cell and the server answers with the
+    index of the cell it plays, which is then played on the board locally.
+
+    @param old_board: the board for which to calculate the best move from.
+    @type old_board: L{Board}
+
+    @param on_success: called with the request and the string of the board
+        after the servers move.
+    @type on_success: C{function}
+
+    @param on_failure: called with the request and the error if the request
+        fails.
+    @type on_failure: C{function}
+    """
+    board_string = board.to_string(old_board)
+
+    def on_packed_move(req, resp):
+        move = wire.unpack_moves(resp)[0]
+        if move is None:
+            on_success(req, board_string)
+            return
+        symbol = old_board.symbols_in_turn_order()[0]
+        on_success(req,
+            board_string[:move] + symbol + board_string[move + 1:])
+
+    UrlRequest(
+        url='http://' + config.host + ':' + str(config.port) + '/packed',
+        req_body=wire.pack(bitboard.from_string(board_string)),
+        req_headers={'Content-Type': 'application/octet-stream'},
+        on_success=on_packed_move, on_error=on_failure, on_failure=on_failure)
 
 def quit_game():
     """
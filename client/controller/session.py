@@ -0,0 +1,172 @@
+"""
+The client side of session mode, see L{server.session}.
+
+The game is played over one connection to config.session_port, kept open
+for the life of the client.  Only the index of the cell the user played is
+sent; the server keeps the position.  Requires the Twisted reactor to be
+installed into Kivy (see L{client.main}).
+"""
+
+from collections import deque
+
+from twisted.internet.protocol import ClientFactory
+from twisted.protocols.basic import LineReceiver
+
+from common import config
+from common.log import ModuleLogger
+from common.model import board
+
+# Logs as this module.
+logger = ModuleLogger()
+
+# The connected L{SessionClient}, or C{None}.
+_client = None
+
+# Whether a connection attempt is under way, so that only one is made at a
+# time.
+_connecting = False
+
+class SessionClient(LineReceiver):
+    """
+    Sends session commands and passes each reply to the callback given with
+    its command.  The server answers commands in order.
+
+    @ivar board_string: the position held by the server, as a board string,
+        or C{None} if no game was started.
+    @type board_string: C{str}
+    """
+    delimiter = '\n'
+
+    def __init__(self):
+        self.replies = deque()
+        self.board_string = None
+
+    def connectionMade(self):
+        global _client, _connecting
+        _client = self
+        _connecting = False
+
+    def connectionLost(self, reason):
+        global _client
+        _client = None
+        # The commands awaiting a reply will never get one.
+        while self.replies:
+            self.replies.popleft()('error connection lost')
+
+    def lineReceived(self, line):
+        self.replies.popleft()(line)
+
+    def command(self, line, callback=None):
+        """
+        Send a command.
+
+        @param line: the command.
+        @type line: C{str}
+
+        @param callback: called with the reply.
+        @type callback: C{function}
+        """
+        self.replies.append(callback or (lambda reply: None))
+        self.sendLine(line)
+
+    def get_move(self, board_string, on_board, fallback):
+        """
+        Have the server move on a board.
+
+        A board following the servers position by one move is answered by
+        sending that move.  A blank board, or one holding only the users first
+        move, starts a new game.  Any other board cannot be played in the
+        session.
+
+        @param board_string: the board.
+        @type board_string: C{str}
+
+        @param on_board: called with the board after the servers move.
+        @type on_board: C{function}
+
+        @param fallback: called without arguments if the server answers with
+            an error or the connection is lost before it answers.
+        @type fallback: C{function}
+
+        @return: whether the board was sent.
+        @rtype: C{bool}
+        """
+        known = self.board_string
+        changed = []
+        if known is not None and len(known) == len(board_string):
+            changed = [i for i, (old, new)
+                in enumerate(zip(known, board_string)) if old != new]
+        if len(changed) != 1 or known[changed[0]] != ' ':
+            changed = [i for i, state in enumerate(board_string)
+                if state != ' ']
+            if len(changed) > 1:
+                return False
+            self.command('new {0}'.format(int(len(board_string) ** 0.5)))
+        symbol = board.from_string(board_string).symbols_in_turn_order()[0]
+
+        def on_reply(reply):
+            words = reply.split()
+            if words[0] == 'move':
+                move = int(words[1])
+                self.board_string = (board_string[:move] + symbol
+                    + board_string[move + 1:])
+                on_board(self.board_string)
+            elif words[0] == 'over':
+                self.board_string = board_string
+                on_board(board_string)
+            else:
+                logger.err('Session error: {reply}', reply=reply)
+                self.board_string = None
+                fallback()
+
+        self.command('play {0}'.format(changed[0]) if changed else 'go',
+            on_reply)
+        return True
+
+class SessionClientFactory(ClientFactory):
+    """
+    Builds the L{SessionClient}.
+    """
+    protocol = SessionClient
+
+    def clientConnectionFailed(self, connector, reason):
+        global _connecting
+        logger.warn('Session connection failed: {reason}',
+            reason=reason.getErrorMessage())
+        _connecting = False
+
+def connect():
+    """
+    Connect to the servers session port, unless a connection attempt is
+    already under way.
+    """
+    global _connecting
+    if _connecting:
+        return
+    _connecting = True
+    from twisted.internet import reactor
+    reactor.connectTCP(config.host, config.session_port,
+        SessionClientFactory())
+
+def get_move(old_board, on_board, fallback):
+    """
+    Get the servers next move over the session connection.
+
+    @param old_board: the board for which to calculate the best move from.
+    @type old_board: L{Board}
+
+    @param on_board: called with the string of the board after the servers
+        move.
+    @type on_board: C{function}
+
+    @param fallback: called without arguments if the board cannot be played
+        over the session connection, e.g. because it is not connected or the
+        server answers with an error.
+    @type fallback: C{function}
+    """
+    if _client is None:
+        connect()
+        fallback()
+    elif not _client.get_move(board.to_string(old_board), on_board,
+            fallback):
+        fallback()
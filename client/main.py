@@ -1,5 +1,8 @@
 from kivy.app import App
 from kivy.factory import Factory
+from kivy.support import install_twisted_reactor
+
+from common import config
 
 def register_widgets():
     """
@@ -19,5 +22,10 @@ class TTT(App):
     kv_directory = 'view'
 
 if __name__ == '__main__':
+    if config.wire_format == 'session':
+        # Must run before anything imports the Twisted reactor.
+        install_twisted_reactor()
+        from client.controller import session
+        session.connect()
     register_widgets()
     TTT().run()
@@ -1,2 +1,90 @@
 host = 'localhost'
 port = 8880
+
+# Where the client searches for the computers moves: 'local' in the client
+# process, 'remote' on the server, or 'auto' to choose by board size and
+# measured latency, see client/controller/engine.py.
+engine = 'auto'
+
+# In 'auto' mode, the largest side length searched locally until the latency
+# of both engines has been measured.
+local_max_side_len = 4
+
+# How the client sends boards to the server: 'text' as a board string in the
+# query, 'packed' in the compact binary format of common/wire.py, or 'session'
+# as moves over one connection to session_port, falling back to 'text' when
+# that is not possible.
+wire_format = 'text'
+
+# Messages below this level are not logged: 'DEBUG', 'INFO', 'WARNING',
+# 'ERROR', 'CRITICAL', or 'OFF' to disable logging.
+log_level = 'INFO'
+
+# The server queues log messages and writes them from a background thread.
+# The number of queued messages beyond which further messages are dropped.
+log_buffer_size = 2 ** 12
+
+# The maximum time in seconds a queued log message waits to be written.
+log_flush_interval = 0.5
+
+# The number of cells in a row, column or diagonal that wins a game.  0, or
+# anything larger than the side length, means a whole row, column or main
+# diagonal.
+win_length = 0
+
+# The memory in bytes each transposition table may hold once full.  Every
+# search thread of the server (see search_threads), every search worker process
+# (see search_workers) and the local engine of the client has its own table, so
+# the server may hold up to (search_threads + search_workers) * tt_bytes.  The
+# capacity derived from it is estimated, see server/ai/transposition.py.
+tt_bytes = 64 * 2 ** 20
+
+# The transposition table replacement policy: 'depth' or 'lru'.
+tt_policy = 'depth'
+
+# The time in milliseconds the server spends searching boards larger than 3x3.
+search_budget_ms = 500
+
+# How searches of boards larger than 3x3 score the positions at the depth limit:
+# 'threats' weighs the open lines, threats and forks of each player, 'filled'
+# counts the taken cells of the fullest line.
+heuristic = 'threats'
+
+# Whether searches of boards larger than 3x3 score the positions at the depth
+# limit in batches with NumPy.  Only applies to the 'filled' heuristic and is
+# ignored if NumPy is not installed.
+vectorized_leaves = True
+
+# The number of processes the server uses to search boards larger than 3x3 in
+# parallel.  0 or 1 searches in the server process.
+search_workers = 0
+
+# The maximum number of searches the server runs at once.  Each search thread
+# has its own transposition table of up to tt_bytes.
+search_threads = 2
+
+# The port the server accepts session connections on, which play whole games
+# over one connection (see server/session.py).  0 disables session mode.
+session_port = 8881
+
+# The memory in bytes of the transposition table each open session keeps
+# between its searches, in addition to the tables of the search threads.
+session_tt_bytes = 16 * 2 ** 20
+
+# The time in milliseconds a session spends searching ahead of the clients
+# move each turn, see server/session.py.  0 disables pondering.
+ponder_budget_ms = 4000
+
+# The total time in milliseconds a session may spend pondering over its whole
+# game, so that many idle sessions cannot keep the pondering threads busy.
+ponder_session_budget_ms = 60000
+
+# The number of threads pondering for all sessions.  Pondering never delays
+# the searches of clients waiting for a move, which run on separate threads.
+ponder_threads = 1
+
+# The number of responses the server keeps, keyed by board.
+response_cache_size = 2 ** 16
+
+# How long in seconds clients and proxies may cache a response.
+http_max_age = 3600
@@ -1,9 +1,21 @@
 """
 Logging functionality for classes and module level functions.
+
+Messages below the current level (see L{set_level}) are dropped before they
+are formatted, so a disabled log call costs a comparison.  Setting the level
+to L{OFF} disables logging altogether; code in hot paths can also test
+L{enabled} to skip building the arguments of a log call.
+
+Messages are passed on to Python logging as they are logged, by the thread
+logging them.  The server instead queues them in a L{BufferedSink}, see
+L{buffer_log}, so that no request waits on the terminal or the disk.
 """
 
-from inspect import stack
-from inspect import getmodule
+import sys
+from collections import deque
+from threading import Event
+from threading import Lock
+from threading import Thread
 
 from logging import DEBUG
 from logging import INFO
@@ -12,18 +24,214 @@ from logging import ERROR
 from logging import CRITICAL
 
 from twisted.python import log
+
+from common import config
+
 # Have the Twisted logger emit to the Kivy log for the client.
-log.addObserver(log.PythonLoggingObserver('kivy').emit)
+_python_observer = log.PythonLoggingObserver('kivy').emit
+log.addObserver(_python_observer)
+
+# A level above every message level, disabling logging.
+OFF = CRITICAL + 10
+
+# The levels accepted by name in config.log_level.
+LEVELS = {
+    'DEBUG': DEBUG,
+    'INFO': INFO,
+    'WARNING': WARNING,
+    'ERROR': ERROR,
+    'CRITICAL': CRITICAL,
+    'OFF': OFF,
+}
+
+# Messages below this level are dropped.
+_level = INFO
+
+def set_level(level):
+    """
+    Set the level below which messages are dropped.
+
+    @param level: a level such as C{logging.INFO}, or its name in L{LEVELS}.
+        L{OFF} disables logging.
+    @type level: C{int} or C{str}
+    """
+    global _level
+    _level = LEVELS[level] if level in LEVELS else level
+
+def enabled(level):
+    """
+    Whether messages of the given level are logged.
+
+    @param level: the level.
+    @type level: C{int}
+
+    @rtype: C{bool}
+    """
+    return level >= _level
+
+set_level(config.log_level)
+
+def buffer_log(capacity, interval):
+    """
+    Queue log messages in a L{BufferedSink} instead of passing them on to
+    Python logging as they are logged.
+
+    @param capacity: see L{BufferedSink}.
+    @type capacity: C{int}
+
+    @param interval: see L{BufferedSink}.
+    @type interval: C{float}
+
+    @return: the started sink.
+    @rtype: L{BufferedSink}
+    """
+    sink = BufferedSink(_python_observer, capacity, interval)
+    sink.start()
+    log.removeObserver(_python_observer)
+    log.addObserver(sink.emit)
+    return sink
+
+def unbuffer_log(sink):
+    """
+    Stop a sink returned by L{buffer_log}, writing what it holds, and pass log
+    messages on directly again.
+
+    @param sink: the sink.
+    @type sink: L{BufferedSink}
+    """
+    log.removeObserver(sink.emit)
+    log.addObserver(_python_observer)
+    sink.stop()
+
+class BufferedSink(object):
+    """
+    A Twisted log observer queueing log events for a background thread.
+
+    Logging a message appends its event to a bounded queue and returns.  The
+    writer thread wakes every interval seconds, or sooner once the queue is
+    half full, and passes the queued events on to the wrapped observer in one
+    batch.  Events logged while the queue is full are dropped and counted.
+
+    @ivar observer: the observer the events are written to.
+    @type observer: C{function}
+
+    @ivar capacity: the maximum number of queued events.
+    @type capacity: C{int}
+
+    @ivar interval: the maximum time in seconds between batches.
+    @type interval: C{float}
+
+    @ivar dropped: the number of events dropped so far.
+    @type dropped: C{int}
+    """
+
+    def __init__(self, observer, capacity, interval):
+        """
+        Construct a L{BufferedSink}.  Events are only written once it has been
+        started, see L{start}.
+
+        @param observer: the observer to write the events to.
+        @type observer: C{function}
+
+        @param capacity: the maximum number of queued events.
+        @type capacity: C{int}
+
+        @param interval: the maximum time in seconds between batches.
+        @type interval: C{float}
+        """
+        self.observer = observer
+        self.capacity = capacity
+        self.interval = interval
+        self.events = deque()
+        self.dropped = 0
+        # Guards dropped, counted by any thread logging.
+        self.drop_lock = Lock()
+        # The drops already reported in the log.
+        self.reported = 0
+        self.wake = Event()
+        self.running = False
+        self.thread = None
+
+    def emit(self, event):
+        """
+        Queue an event.  Called by the Twisted logging system on any thread.
+
+        @param event: the event.
+        @type event: C{dict}
+        """
+        events = self.events
+        if len(events) >= self.capacity:
+            with self.drop_lock:
+                self.dropped += 1
+            return
+        events.append(event)
+        if len(events) * 2 >= self.capacity:
+            self.wake.set()
+
+    def flush(self):
+        """
+        Write every queued event, and log a warning if events were dropped.
+        """
+        events = self.events
+        while events:
+            self.observer(events.popleft())
+        dropped = self.dropped
+        if dropped != self.reported:
+            # Queued like any other message, to be written with the next batch.
+            log.msg('BufferedSink: dropped {0} log messages'.format(
+                dropped - self.reported), logLevel=WARNING)
+            self.reported = dropped
+
+    def start(self):
+        """
+        Start the writer thread.
+        """
+        self.running = True
+        self.thread = Thread(target=self.run, name='log-writer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        """
+        Write batches of events until stopped.
+        """
+        while self.running:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.flush()
+
+    def stop(self):
+        """
+        Stop the writer thread and write the events still queued.
+        """
+        self.running = False
+        self.wake.set()
+        self.thread.join()
+        self.flush()
 
 class Loggable(object):
     """
     Mixin for classes that need logging functionality.
     """
+    # Keeps slotted subclasses such as L{common.model.cell.Cell} slotted.
+    __slots__ = ()
+
+    def log_name(self):
+        """
+        Return the name logged in front of the messages.
+
+        @return: the name of the class.
+        @rtype: C{str}
+        """
+        return self.__class__.__name__
+
     def log(self, msg, kwargs, level):
         """
         Write a message to the log containg the logging classes name along with
         the message to be logged.
 
+        Nothing is formatted if the level is disabled.
+
         @param msg: The message to be logged.
         @type msg: C{str}
 
@@ -34,7 +242,9 @@ class Loggable(object):
         @param level: the log level of the message.
         @type level: C{int}
         """
-        log.msg(self.__class__.__name__
+        if level < _level:
+            return
+        log.msg(self.log_name()
             + ': '
             + msg.format(**kwargs),
             logLevel=level)
@@ -57,13 +267,26 @@ class Loggable(object):
 
 class ModuleLogger(Loggable):
     '''
-    A class extending Loggable that includes the module from which its log
-    method was called from in the log messages it outputs.
+    A class extending Loggable that includes the name of a module in the log
+    messages it outputs.
+
+    Each module creates its own logger:
+        logger = ModuleLogger()
+
+    @ivar name: the module name.
+    @type name: C{str}
     '''
-    def log(self, msg, kwargs, level):
-        log.msg(getmodule(stack()[2][0]).__name__
-            + ': '
-            + msg.format(**kwargs),
-            logLevel=level)
+    __slots__ = ('name',)
+
+    def __init__(self, name=None):
+        '''
+        Construct a L{ModuleLogger}.
+
+        @param name: the module name, by default that of the module creating
+            the logger.
+        @type name: C{str}
+        '''
+        self.name = name or sys._getframe(1).f_globals['__name__']
 
-logger = ModuleLogger()
+    def log_name(self):
+        return self.name
@@ -0,0 +1,484 @@
+"""
+A bitboard representation of a Tic-Tac-Toe board of variable size.
+
+L{BitBoard} is a drop-in alternative to L{Board} for the server.  Instead of a
+C{list} of L{Cell}s it stores the position as two integers, one bit per cell
+for each player, so turn, win, draw and child calculations become a handful of
+bit operations.  The factory functions mirror the ones in L{common.model.board}
+so that callers only need to swap the module they import.
+"""
+
+from math import sqrt
+
+from common.model import board as board_model
+from common.model.board import transforms
+from common.model.lines import line_index
+
+# Byte lookup tables applying each symmetry to a bitmask, keyed by side length.
+_symmetry_tables = {}
+
+def symmetry_tables(side_len):
+    """
+    Return lookup tables that apply each of L{transforms} to a bitmask.
+
+    A bitmask is transformed 8 bits at a time: for every symmetry there is a
+    C{list} of (shift, table) pairs where table maps the byte found at shift to
+    the bits it moves to.  See L{transform_bits}.
+
+    @param side_len: the side length of the board.
+    @type side_len: C{int}
+
+    @return: the tables of each symmetry, in the order of L{transforms}.
+    @rtype: C{tuple} of C{tuple} of (C{int}, C{tuple} of C{int})
+    """
+    if side_len not in _symmetry_tables:
+        size = side_len ** 2
+        tables = []
+        for perm in transforms(side_len):
+            chunks = []
+            for shift in range(0, size, 8):
+                table = []
+                for byte in range(256):
+                    bits = 0
+                    for j in range(min(8, size - shift)):
+                        if byte >> j & 1:
+                            bits |= 1 << perm[shift + j]
+                    table.append(bits)
+                chunks.append((shift, tuple(table)))
+            tables.append(tuple(chunks))
+        _symmetry_tables[side_len] = tuple(tables)
+    return _symmetry_tables[side_len]
+
+def transform_bits(bits, chunks):
+    """
+    Apply a symmetry to a bitmask.
+
+    @param bits: the bitmask.
+    @type bits: C{int}
+
+    @param chunks: the tables of one symmetry from L{symmetry_tables}.
+
+    @return: the transformed bitmask.
+    @rtype: C{int}
+    """
+    result = 0
+    for shift, table in chunks:
+        result |= table[bits >> shift & 255]
+    return result
+
+def popcount(bits):
+    """
+    Count the set bits of an integer.
+
+    @param bits: the integer to count.
+    @type bits: C{int}
+
+    @return: The number of set bits.
+    @rtype: C{int}
+    """
+    return bin(bits).count('1')
+
+# Factory functions
+def blank(side_len):
+    """
+    Create a blank L{BitBoard}.
+
+    @param side_len: the side length of the board.
+    @type side_len: C{int}
+
+    @return: A blank L{BitBoard}
+    @rtype: L{BitBoard}
+    """
+    return BitBoard(side_len)
+
+def from_string(string):
+    """
+    Construct a L{BitBoard} from its string representation.
+
+    @param string: a string representing the board state.  Composed of 'X', 'O'
+        and ' ' characters only.  The length of the string should be a perfect
+        square.
+    @type string: C{str}
+
+    @return: A L{BitBoard} representation of the input string.
+    @rtype: L{BitBoard}
+    """
+    x_bits = o_bits = 0
+    for i, state in enumerate(string):
+        if state == 'X':
+            x_bits |= 1 << i
+        elif state == 'O':
+            o_bits |= 1 << i
+    return BitBoard(int(sqrt(len(string))), x_bits, o_bits)
+
+def to_string(board):
+    """
+    Construct the string representation of a L{BitBoard}.
+
+    L{Board}s are accepted as well and are delegated to
+    L{common.model.board.to_string}.
+
+    @param board: the board model.
+    @type board: L{BitBoard} or L{Board}
+
+    @return: A string representation of the given board.
+    @rtype: C{str}
+    """
+    if not isinstance(board, BitBoard):
+        return board_model.to_string(board)
+
+    x_bits, o_bits = board.x_bits, board.o_bits
+    return ''.join([
+        'X' if x_bits >> i & 1 else 'O' if o_bits >> i & 1 else ' '
+        for i in range(board.size())])
+
+class BitBoard(object):
+    """
+    Bitboard model class.
+
+    Provides the same methods as L{Board}.  Bit i of x_bits (o_bits) is set when
+    the L{Cell} at index i holds an 'X' ('O').  Cells are indexed from
+    left-to-right top-to-bottom.
+
+    @ivar side: the side length of the board.
+    @type side: C{int}
+
+    @ivar x_bits: the cells occupied by 'X'.
+    @type x_bits: C{int}
+
+    @ivar o_bits: the cells occupied by 'O'.
+    @type o_bits: C{int}
+
+    @ivar last: the index of the cell played to reach this board, or C{None}
+        if unknown.  When known, win detection only examines the lines that
+        pass through it.
+    @type last: C{int} or C{None}
+    """
+
+    def __init__(self, side, x_bits=0, o_bits=0, last=None):
+        """
+        Construct a L{BitBoard} with the given side length and occupancy.
+
+        @param side: the side length of the board.
+        @type side: C{int}
+
+        @param x_bits: the cells occupied by 'X'.
+        @type x_bits: C{int}
+
+        @param o_bits: the cells occupied by 'O'.
+        @type o_bits: C{int}
+
+        @param last: the index of the cell played to reach this board.
+        @type last: C{int} or C{None}
+        """
+        self.side = side
+        self.x_bits = x_bits
+        self.o_bits = o_bits
+        self.last = last
+
+    def __eq__(self, other):
+        return isinstance(other, BitBoard) and\
+            (self.side, self.x_bits, self.o_bits) ==\
+            (other.side, other.x_bits, other.o_bits)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.side, self.x_bits, self.o_bits))
+
+    def __repr__(self):
+        return 'BitBoard({0!r})'.format(to_string(self))
+
+    def size(self):
+        """
+        Return the total number of cells on this L{BitBoard}.
+
+        @return: Cell count
+        @rtype: C{int}
+        """
+        return self.side * self.side
+
+    def side_len(self):
+        """
+        Return the side length of the L{BitBoard}.
+
+        @return: side length
+        @rtype: C{int}
+        """
+        return self.side
+
+    def full_mask(self):
+        """
+        Return a bitmask with a bit set for every cell of this L{BitBoard}.
+
+        @return: the mask of all cells.
+        @rtype: C{int}
+        """
+        return (1 << self.size()) - 1
+
+    def x_has_next_turn(self):
+        """
+        Whether it is 'X's turn to move.
+
+        @return: Whether is is 'X's turn.
+        @rtype: C{bool}
+        """
+        return popcount(self.x_bits) <= popcount(self.o_bits)
+
+    def symbols_in_turn_order(self):
+        """
+        Return a tuple containing 'X' and 'O' ordered by who takes the next
+        turn.
+
+        @return: A tuple of 'X' and 'O' in turn order.
+        @rtype: C{tuple} of C{str}
+        """
+        return ('X', 'O') if self.x_has_next_turn() else ('O', 'X')
+
+    def empty_cells(self):
+        """
+        Return the indices of the blank cells in ascending order.
+
+        @return: the blank cell indices.
+        @rtype: C{list} of C{int}
+        """
+        taken = self.x_bits | self.o_bits
+        return [i for i in range(self.size()) if not taken >> i & 1]
+
+    def canonical(self):
+        """
+        Map this position to the canonical member of its symmetry class.
+
+        Bitmask counterpart of L{common.model.board.canonical}; the canonical
+        position is the transform with the smallest packed (o_bits, x_bits).
+
+        @return: the canonical x_bits and o_bits, and the index into
+            L{transforms} of the symmetry that produces them.
+        @rtype: C{tuple} of C{int}, C{int} and C{int}
+        """
+        x_bits, o_bits, size = self.x_bits, self.o_bits, self.size()
+        best = None
+        for t, chunks in enumerate(symmetry_tables(self.side)):
+            x = o = 0
+            for shift, table in chunks:
+                x |= table[x_bits >> shift & 255]
+                o |= table[o_bits >> shift & 255]
+            key = o << size | x
+            if best is None or key < best:
+                best, canonical = key, (x, o, t)
+        return canonical
+
+    def distinct_moves(self):
+        """
+        Return the blank cells that lead to positions unrelated by symmetry.
+
+        Moves that a symmetry of this position maps onto each other lead to
+        equivalent children, so only the lowest index of each group is kept.
+
+        @return: the blank cell indices in ascending order.
+        @rtype: C{list} of C{int}
+        """
+        x_bits, o_bits = self.x_bits, self.o_bits
+        stabilizer = [perm for perm, chunks in
+            zip(transforms(self.side), symmetry_tables(self.side))
+            if transform_bits(x_bits, chunks) == x_bits
+            and transform_bits(o_bits, chunks) == o_bits]
+
+        moves, seen = [], set()
+        for move in self.empty_cells():
+            if move not in seen:
+                moves.append(move)
+                seen.update([perm[move] for perm in stabilizer])
+        return moves
+
+    def copy(self):
+        """
+        Return an independent copy of this L{BitBoard}.
+
+        @return: the copy.
+        @rtype: L{BitBoard}
+        """
+        return BitBoard(self.side, self.x_bits, self.o_bits, self.last)
+
+    def play(self, index, x_turn=None):
+        """
+        Place a symbol in the given blank cell, modifying this L{BitBoard}.
+
+        Used by the search to make a move in place rather than construct a
+        child.  L{undo} reverts it.
+
+        @param index: the blank cell to play.
+        @type index: C{int}
+
+        @param x_turn: whether 'X' is playing.  Calculated from the board when
+            C{None}.
+        @type x_turn: C{bool} or C{None}
+        """
+        if x_turn is None:
+            x_turn = self.x_has_next_turn()
+        if x_turn:
+            self.x_bits |= 1 << index
+        else:
+            self.o_bits |= 1 << index
+        self.last = index
+
+    def undo(self, index, last=None):
+        """
+        Clear the given cell, reverting a call to L{play}.
+
+        @param index: the cell to clear.
+        @type index: C{int}
+
+        @param last: the last move to restore.
+        @type last: C{int} or C{None}
+        """
+        mask = ~(1 << index)
+        self.x_bits &= mask
+        self.o_bits &= mask
+        self.last = last
+
+    def children(self):
+        """
+        Calculate the child L{BitBoard}s of this L{BitBoard}.
+
+        See L{Board.children}.
+
+        @return: A list of L{BitBoard}s representing possible next moves.
+        @rtype: C{list} of L{BitBoard}
+        """
+        side, x_bits, o_bits = self.side, self.x_bits, self.o_bits
+        if self.x_has_next_turn():
+            return [BitBoard(side, x_bits | 1 << i, o_bits, i)
+                for i in self.empty_cells()]
+        return [BitBoard(side, x_bits, o_bits | 1 << i, i)
+            for i in self.empty_cells()]
+
+    def is_win(self):
+        """
+        Whether this L{BitBoard} represents a win for any player.
+
+        If the last move is known only the lines through it are examined since
+        a game ends as soon as a line is completed.
+
+        @return: Whether this board is a winning board.
+        @rtype: C{bool}
+        """
+        x_bits, o_bits = self.x_bits, self.o_bits
+        if self.last is not None:
+            return self.is_win_at(self.last)
+        for mask in line_index(self.side).masks:
+            if x_bits & mask == mask or o_bits & mask == mask:
+                return True
+        return False
+
+    def is_win_at(self, index):
+        """
+        Whether the player occupying the given cell has completed a line
+        through it.
+
+        Only the at most 4 * k lines of k cells holding the cell are tested,
+        however large the board.
+
+        @param index: the cell index.
+        @type index: C{int}
+
+        @return: Whether a line through the cell is complete.
+        @rtype: C{bool}
+        """
+        bits = self.x_bits if self.x_bits >> index & 1 else self.o_bits
+        for mask in line_index(self.side).cell_masks[index]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def is_draw(self):
+        """
+        Whether every cell of this L{BitBoard} is taken.
+
+        See L{Board.is_draw}.
+
+        @return: Whether this board is a tie board.
+        @rtype: C{bool}
+        """
+        return self.x_bits | self.o_bits == self.full_mask()
+
+    def is_leaf_and_score(self):
+        """
+        Whether this game represents a 'Game Over' (win or draw) along with
+        the corresponding score.
+
+        See L{Board.is_leaf_and_score}.
+
+        @return: Whether this board is a game state leaf, and its score.
+        @rtype: C{tuple} of a C{bool} with C{float} or a C{bool} with C{None}
+        """
+        if self.is_win():
+            return True, 1.0
+        elif self.is_draw():
+            return True, 0.0
+        return False, None
+
+    def row_lines(self):
+        """
+        Calculate the rows of this L{BitBoard}.
+
+        @return: A C{list} of the string representations of the rows.
+        @rtype: C{list} of C{str}
+        """
+        as_string = to_string(self)
+        side_len = self.side
+        return [
+            as_string[i * side_len: (i + 1) * side_len]
+            for i in range(side_len)]
+
+    def col_lines(self):
+        """
+        Calculate the columns of this L{BitBoard}.
+
+        @return: A C{list} of the string representations of the columns.
+        @rtype: C{list} of C{str}
+        """
+        as_string = to_string(self)
+        return [as_string[i::self.side] for i in range(self.side)]
+
+    def zig_line(self):
+        """
+        Calculate the diagonal line from the top-left to the bottom-right.
+
+        @return: A list containing the single string of the diagonal.
+        @rtype: C{list} of C{str}
+        """
+        return [to_string(self)[::self.side + 1]]
+
+    def zag_line(self):
+        """
+        Calculate the diagonal line from the bottom-left to the top-right.
+
+        @return: A list containing the single string of the diagonal.
+        @rtype: C{list} of C{str}
+        """
+        return [to_string(self)[-self.side:-self.size():-(self.side - 1)]]
+
+    def all_lines(self):
+        """
+        Returns a list of all possible lines for this L{BitBoard}.
+
+        @return: A C{list} of all lines for this board.
+        """
+        return self.row_lines() +\
+            self.col_lines() +\
+            self.zig_line() +\
+            self.zag_line()
+
+    def heur_score(self):
+        """
+        Provides a heuristic score for this L{BitBoard}.
+
+        Equivalent to L{Board.heur_score}: the largest fraction of taken cells
+        over all lines, divided by two.
+        """
+        taken = self.x_bits | self.o_bits
+        lines = line_index(self.side)
+        return max([popcount(taken & mask) for mask in lines.masks])\
+            / (lines.win_length * 2.0)
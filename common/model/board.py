@@ -2,24 +2,30 @@
 A representation of a Tic-Tac-Toe board of variable size.
 """
 
+from functools import reduce
 from math import sqrt
 
 from common.model.cell import Cell
+from common.model.cell import CellBase
+from common.model.lines import line_index
 
 # Factory functions
-def blank(side_len):
+def blank(side_len, cell=Cell):
     """
     Create a blank L{Board} where the state of every cell is ' '.
 
     @param side_len: the side length of the board.
     @type side_len: C{int}
 
+    @param cell: the cell type to build the board from.
+    @type cell: C{type}
+
     @return: A blank L{Board}
     @rtype: L{Board}
     """
-    return Board([Cell(i, ' ') for i in range(side_len ** 2)])
+    return Board([cell(i, ' ') for i in range(side_len ** 2)])
 
-def from_string(string):
+def from_string(string, cell=Cell):
     """
     Construct a L{Board} from its string representation.
 
@@ -28,10 +34,15 @@ def from_string(string):
         square.
     @type string: C{str}
 
+    @param cell: the cell type to build the board from.  L{Cell} logs and
+        checks moves; boards only the engine looks at can use the cheaper
+        L{CellBase}.
+    @type cell: C{type}
+
     @return: A L{Board} representation of the input string.
     @rtype: L{Board}
     """
-    return Board([Cell(i, state) for i, state in enumerate(string)])
+    return Board([cell(i, state) for i, state in enumerate(string)])
 
 def to_string(board):
     """
@@ -45,6 +56,93 @@ def to_string(board):
     """
     return ''.join([cell.state for cell in board.state])
 
+# Symmetries
+# Permutations of cell indices keyed by side length.
+_transforms = {}
+
+def transforms(side_len):
+    """
+    Return the 8 symmetries of a square board of the given side length.
+
+    Each symmetry is a permutation of cell indices: the cell at index i moves
+    to index perm[i].  The first is the identity, followed by the rotations by
+    90, 180 and 270 degrees, then the same four applied after a left-right
+    mirror.
+
+    @param side_len: the side length of the board.
+    @type side_len: C{int}
+
+    @return: the 8 permutations.
+    @rtype: C{tuple} of C{tuple} of C{int}
+    """
+    if side_len not in _transforms:
+        last = side_len - 1
+        perms = []
+        for mirror in (False, True):
+            for turns in range(4):
+                perm = []
+                for i in range(side_len ** 2):
+                    row, col = divmod(i, side_len)
+                    if mirror:
+                        col = last - col
+                    for _ in range(turns):
+                        row, col = col, last - row
+                    perm.append(row * side_len + col)
+                perms.append(tuple(perm))
+        _transforms[side_len] = tuple(perms)
+    return _transforms[side_len]
+
+def inverse(perm):
+    """
+    Return the inverse of a permutation returned by L{transforms}.
+
+    @param perm: the permutation.
+    @type perm: C{tuple} of C{int}
+
+    @return: the permutation that undoes perm.
+    @rtype: C{tuple} of C{int}
+    """
+    inverted = [0] * len(perm)
+    for i, j in enumerate(perm):
+        inverted[j] = i
+    return tuple(inverted)
+
+def transform_string(string, perm):
+    """
+    Apply a symmetry to the string representation of a L{Board}.
+
+    @param string: the board string.
+    @type string: C{str}
+
+    @param perm: a permutation returned by L{transforms}.
+    @type perm: C{tuple} of C{int}
+
+    @return: the transformed board string.
+    @rtype: C{str}
+    """
+    chars = [' '] * len(string)
+    for i, state in enumerate(string):
+        chars[perm[i]] = state
+    return ''.join(chars)
+
+def canonical(string):
+    """
+    Map a board string to the canonical member of its symmetry class.
+
+    Positions that are rotations or mirror images of each other have the same
+    canonical form, the smallest of their 8 transformed strings.
+
+    @param string: the board string.
+    @type string: C{str}
+
+    @return: the canonical string and the index into L{transforms} of the
+        symmetry that produces it from string.
+    @rtype: C{tuple} of C{str} and C{int}
+    """
+    perms = transforms(int(sqrt(len(string))))
+    return min([(transform_string(string, perm), t)
+        for t, perm in enumerate(perms)])
+
 class Board(object):
     """
     Board model class.
@@ -56,6 +154,7 @@ class Board(object):
     @ivar state: A list of L{Cell}s representing the current state of the board.
     @type state: C{list} of L{Cell}
     """
+    __slots__ = ('state',)
 
     def __init__(self, state):
         """
@@ -114,7 +213,8 @@ class Board(object):
         the next turn calculate the L{Board}s for all possible next moves.
         This is equivalent to yielding a L{Board} for each replacement of  ' '
         with the symbol ('X' or 'O') representing the player whose turn it is.
-        This is used by the minimax algorithm to build the game state tree.
+        This is used by the minimax algorithm to build the game state tree, so
+        the children are built from plain L{CellBase} cells.
 
         @return: A list of L{Board}s representing possible next moves.
         @rtype: C{list} of L{Board}
@@ -127,7 +227,7 @@ class Board(object):
             char_list[i] = symbol
             return ''.join(char_list)
 
-        return [from_string(replace_cell(i))
+        return [from_string(replace_cell(i), CellBase)
             for i, char in enumerate(as_string)
             if char == ' ']
 
@@ -138,7 +238,12 @@ class Board(object):
         @return: Whether this board is a winning board.
         @rtype: C{bool}
         """
-        return any(check_line(line) for line in self.all_lines())
+        as_string = to_string(self)
+        for line in line_index(self.side_len()).lines:
+            first = as_string[line[0]]
+            if first != ' ' and all([as_string[i] == first for i in line]):
+                return True
+        return False
 
     def is_draw(self):
         """
@@ -233,8 +338,8 @@ class Board(object):
         """
         Returns a list of all possible lines for this L{Board}.
 
-        This is used by is_win() and heur_score() to determine whether the board
-        represents a win and its preliminary score respectively.
+        is_win() and heur_score() read the precomputed
+        L{common.model.lines.LineIndex} instead of building these strings.
 
         @return: A C{list} of all lines for this board.
         """
@@ -262,7 +367,11 @@ class Board(object):
         L{Board} sizes greater than 3x3 the depth of the search is limitied and
         L{Board}s are assigned this preliminary score.
         """
-        return max([self.score_line(line) for line in self.all_lines()])
+        as_string = to_string(self)
+        lines = line_index(self.side_len())
+        return max([len([i for i in line if as_string[i] != ' '])
+                for line in lines.lines])\
+            / (lines.win_length * 2.0)
 
 def check_line(line):
     """
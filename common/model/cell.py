@@ -17,6 +17,10 @@ class InvalidMove(Exception):
 # concerns like logging and error-checking from the essential functionality
 # of an object.  Additionally it allows you to compose your objects
 # as you desire from components that implement different 'aspects'.
+#
+# Every component declares __slots__ so that no cell carries a __dict__.  The
+# engine builds its boards from bare CellBase cells; only the boards the
+# players move on need the logging and error checking of Cell.
 class CellBase(object):
     """
     Minimal implementation of a cell.
@@ -29,6 +33,7 @@ class CellBase(object):
     'O', or ' '.
     @type state: C{str}
     """
+    __slots__ = ('index', 'state')
 
     def __init__(self, index, state):
         """
@@ -55,6 +60,7 @@ class CellError(Loggable):
     """
     Extends the functionality of L{CellBase} with error checking.
     """
+    __slots__ = ()
 
     def set_state(self, state):
         if not self.state == ' ':
@@ -68,6 +74,7 @@ class CellLogger(Loggable):
     """
     Extends the functionality of L{CellBase} with logging.
     """
+    __slots__ = ()
 
     def set_state(self, state):
         self.info(
@@ -80,4 +87,4 @@ class Cell(CellLogger, CellError, CellBase):
     """
     Implementation of cell with error-checking and logging.
     """
-    pass
+    __slots__ = ()
@@ -0,0 +1,127 @@
+"""
+Precomputed win lines for each board size.
+
+A player wins by taking k cells in a row, column or diagonal, where k is the
+win length (see L{win_length}).  By default k is the side length, so the win
+lines are the rows, the columns and both main diagonals.  With a shorter win
+length every run of k cells along a row, a column or any diagonal is a win
+line.  The lines only depend on the side length and the win length so they are
+calculated once per pair and shared by every L{Board}, L{BitBoard} and the
+search.
+"""
+
+from common import config
+
+# LineIndex instances keyed by side length and win length.
+_indexes = {}
+
+def win_length(side_len):
+    """
+    Return the number of cells in a row that win on a board of the given side
+    length.
+
+    @param side_len: the side length of the board.
+    @type side_len: C{int}
+
+    @return: config.win_length, or the side length if that is 0 or larger.
+    @rtype: C{int}
+    """
+    if not config.win_length:
+        return side_len
+    return min(config.win_length, side_len)
+
+def line_index(side_len, k=None):
+    """
+    Return the L{LineIndex} for the given side length.
+
+    The index is built on first use and cached for the life of the process.
+
+    @param side_len: the side length of the board.
+    @type side_len: C{int}
+
+    @param k: the win length, by default L{win_length}.
+    @type k: C{int}
+
+    @return: The win line index.
+    @rtype: L{LineIndex}
+    """
+    if k is None:
+        k = win_length(side_len)
+    key = side_len, k
+    if key not in _indexes:
+        _indexes[key] = LineIndex(side_len, k)
+    return _indexes[key]
+
+def to_mask(indices):
+    """
+    Convert cell indices to a bitmask.
+
+    @param indices: cell indices.
+    @type indices: iterable of C{int}
+
+    @return: A bitmask with bit i set for each index i.
+    @rtype: C{int}
+    """
+    mask = 0
+    for i in indices:
+        mask |= 1 << i
+    return mask
+
+class LineIndex(object):
+    """
+    The win lines of a board of a given side length and win length.
+
+    @ivar side_len: the side length of the board.
+    @type side_len: C{int}
+
+    @ivar win_length: the number of cells of each line.
+    @type win_length: C{int}
+
+    @ivar lines: the cell indices of each line; rows, then columns, then the
+        top-left to bottom-right and bottom-left to top-right diagonals.
+    @type lines: C{tuple} of C{tuple} of C{int}
+
+    @ivar masks: the bitmask of each line, in the same order as lines.
+    @type masks: C{tuple} of C{int}
+
+    @ivar cell_lines: for each cell the positions in lines of the lines that
+        pass through it.
+    @type cell_lines: C{tuple} of C{tuple} of C{int}
+
+    @ivar cell_masks: for each cell the bitmasks of the lines that pass
+        through it.
+    @type cell_masks: C{tuple} of C{tuple} of C{int}
+    """
+
+    def __init__(self, side_len, k=None):
+        """
+        Build the index for the given side length.
+
+        @param side_len: the side length of the board.
+        @type side_len: C{int}
+
+        @param k: the win length, by default the side length.
+        @type k: C{int}
+        """
+        k = k or side_len
+        self.side_len = side_len
+        self.win_length = k
+        cells = range(side_len)
+        starts = range(side_len - k + 1)
+        steps = range(k)
+        self.lines = tuple(
+            [tuple([row * side_len + col + i for i in steps])
+                for row in cells for col in starts] +
+            [tuple([(row + i) * side_len + col for i in steps])
+                for col in cells for row in starts] +
+            [tuple([(row + i) * side_len + col + i for i in steps])
+                for row in starts for col in starts] +
+            [tuple([(row + k - 1 - i) * side_len + col + i for i in steps])
+                for row in starts for col in starts])
+        self.masks = tuple([to_mask(line) for line in self.lines])
+        self.cell_lines = tuple([
+            tuple([n for n, line in enumerate(self.lines) if i in line])
+            for i in range(side_len ** 2)])
+        self.cell_masks = tuple([
+            tuple([self.masks[n] for n in line_ids])
+            for line_ids in self.cell_lines])
@@ -0,0 +1,122 @@
+"""
+A compact binary encoding of boards and moves for the client and the server.
+
+A board is packed as one byte holding its side length followed by two bit
+planes, the cells taken by 'X' and then the cells taken by 'O', each in
+ceil(side_len ** 2 / 8) big-endian bytes with bit i set for cell i.  That is
+2 bits per cell: 17 bytes for an 8x8 board against 64 characters of text, and
+it unpacks straight into a L{BitBoard} without looking at each cell.  Packed
+boards are self-delimiting so any number of them can be concatenated.
+
+A move is packed as the single byte of the index of the cell played, or
+L{NO_MOVE} if the game was already over.
+"""
+
+from binascii import hexlify
+from binascii import unhexlify
+
+from common.model.bitboard import BitBoard
+
+# The byte sent instead of a cell index when there is no move to make.
+NO_MOVE = 255
+
+# The largest side length whose cell indices fit in a byte below NO_MOVE.
+MAX_SIDE_LEN = 15
+
+def plane_size(side_len):
+    """
+    Return the number of bytes of each bit plane of a packed board.
+
+    @param side_len: the side length of the board.
+    @type side_len: C{int}
+
+    @rtype: C{int}
+    """
+    return (side_len ** 2 + 7) // 8
+
+def pack(board):
+    """
+    Pack a board.
+
+    @param board: the board.
+    @type board: L{BitBoard}
+
+    @return: the packed board.
+    @rtype: C{str}
+    """
+    side_len = board.side_len()
+    digits = plane_size(side_len) * 2
+    return chr(side_len) + unhexlify('{0:0{2}x}{1:0{2}x}'.format(
+        board.x_bits, board.o_bits, digits))
+
+def unpack(data, offset=0):
+    """
+    Unpack a board.
+
+    @param data: packed boards.
+    @type data: C{str}
+
+    @param offset: the position in data of the board to unpack.
+    @type offset: C{int}
+
+    @raise ValueError: if data does not hold a valid board at the offset.
+
+    @return: the board and the offset of the byte following it.
+    @rtype: C{tuple} of L{BitBoard} and C{int}
+    """
+    side_len = ord(data[offset:offset + 1] or '\0')
+    if not 0 < side_len <= MAX_SIDE_LEN:
+        raise ValueError('Invalid side length {0}'.format(side_len))
+    size = plane_size(side_len)
+    start, end = offset + 1, offset + 1 + size * 2
+    if end > len(data):
+        raise ValueError('Truncated board of side length {0}'.format(
+            side_len))
+    x_bits = int(hexlify(data[start:start + size]), 16)
+    o_bits = int(hexlify(data[start + size:end]), 16)
+    if x_bits & o_bits or (x_bits | o_bits) >> side_len ** 2:
+        raise ValueError('Invalid board of side length {0}'.format(side_len))
+    return BitBoard(side_len, x_bits, o_bits), end
+
+def unpack_all(data):
+    """
+    Unpack concatenated boards.
+
+    @param data: the packed boards.
+    @type data: C{str}
+
+    @raise ValueError: if data is not a sequence of valid boards.
+
+    @return: the boards, in order.
+    @rtype: C{list} of L{BitBoard}
+    """
+    boards = []
+    offset = 0
+    while offset < len(data):
+        board, offset = unpack(data, offset)
+        boards.append(board)
+    return boards
+
+def pack_moves(moves):
+    """
+    Pack moves.
+
+    @param moves: the cell index of each move, or C{None} for no move.
+    @type moves: C{list} of C{int}
+
+    @rtype: C{str}
+    """
+    return str(bytearray([NO_MOVE if move is None else move
+        for move in moves]))
+
+def unpack_moves(data):
+    """
+    Unpack moves packed by L{pack_moves}.
+
+    @param data: the packed moves.
+    @type data: C{str}
+
+    @return: the cell index of each move, or C{None} for no move.
+    @rtype: C{list} of C{int}
+    """
+    return [None if move == NO_MOVE else move for move in bytearray(data)]
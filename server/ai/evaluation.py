@@ -0,0 +1,245 @@
+"""
+An incrementally updated threat-based evaluation for the minimax search.
+
+L{BitBoard.heur_score} counts the taken cells of the fullest line, whoever
+took them, and is recalculated from scratch at every position scored.  A
+L{ThreatEvaluator} instead keeps the number of 'X's and 'O's on every line and
+updates them as moves are played and undone, touching only the lines through
+the cell played.  From the counts it maintains:
+
+    - the material balance: every line still open to one player, that is
+      holding no cell of the other, is worth WEIGHT ** (k - 1) to that player,
+      where k is the number of cells the player holds on it.  Lines held by
+      both players can no longer be won and are worth nothing.
+    - the threats of each player: open lines missing a single cell.
+
+A position is then scored for the player who just moved as:
+
+    - -THREAT_SCORE if the opponent, who moves next, has a threat: they win
+      with their next move.
+    - FORK_SCORE if the player has threats completed by two different cells:
+      the opponent can only block one of them.
+    - the material balance scaled into (-MATERIAL_SCORE, MATERIAL_SCORE)
+      otherwise.
+
+Every score lies strictly between the scores of a loss and a win.
+"""
+
+from common.model.bitboard import popcount
+from common.model.lines import line_index
+
+# The factor by which each further cell on an open line raises its worth.
+WEIGHT = 4
+
+# The score of a position whose player to move can win immediately.
+THREAT_SCORE = 0.9
+
+# The score of a position whose player who just moved has a fork.
+FORK_SCORE = 0.8
+
+# The bound of the scaled material balance.
+MATERIAL_SCORE = 0.5
+
+# The heuristics a search can use, see L{evaluator}.
+FILLED = 'filled'
+THREATS = 'threats'
+
+def evaluator(board, heuristic):
+    """
+    Return the evaluator a L{Search} of the given board should use.
+
+    @param board: the position to be searched.
+    @type board: L{BitBoard}
+
+    @param heuristic: L{THREATS} for a L{ThreatEvaluator}, or L{FILLED} for
+        L{BitBoard.heur_score}.
+    @type heuristic: C{str}
+
+    @raise ValueError: if the heuristic is unknown.
+
+    @return: the evaluator, or C{None} for L{FILLED}.
+    @rtype: L{ThreatEvaluator} or C{None}
+    """
+    if heuristic == THREATS:
+        return ThreatEvaluator(board)
+    if heuristic == FILLED:
+        return None
+    raise ValueError('Unknown heuristic {0!r}'.format(heuristic))
+
+def line_values(win_length):
+    """
+    Return the worth of a line to 'X' for every pair of counts.
+
+    @param win_length: the number of cells of a line.
+    @type win_length: C{int}
+
+    @return: the worth of a line holding x 'X's and o 'O's at [x][o].
+        Positive values favour 'X'.
+    @rtype: C{list} of C{list} of C{int}
+    """
+    def worth(count):
+        return WEIGHT ** (count - 1) if count else 0
+
+    counts = range(win_length + 1)
+    return [[worth(x) if not o else -worth(o) if not x else 0 for o in counts]
+        for x in counts]
+
+class ThreatEvaluator(object):
+    """
+    Line counts of a L{BitBoard} kept up to date as moves are played.
+
+    The evaluator must be told of every move played on and undone from its
+    board, after the board itself is updated, see L{play} and L{undo}.
+
+    @ivar board: the board being evaluated.
+    @type board: L{BitBoard}
+
+    @ivar x_counts: the number of 'X's on each line of L{LineIndex.lines}.
+    @type x_counts: C{list} of C{int}
+
+    @ivar o_counts: the number of 'O's on each line.
+    @type o_counts: C{list} of C{int}
+
+    @ivar material: the sum of the worth of every line, see L{line_values}.
+    @type material: C{int}
+
+    @ivar x_threats: the lines 'X' can complete with one move.
+    @type x_threats: C{set} of C{int}
+
+    @ivar o_threats: the lines 'O' can complete with one move.
+    @type o_threats: C{set} of C{int}
+    """
+
+    def __init__(self, board):
+        """
+        Count the lines of the given board.
+
+        @param board: the board to evaluate.
+        @type board: L{BitBoard}
+        """
+        index = line_index(board.side_len())
+        k = index.win_length
+        self.board = board
+        self.masks = index.masks
+        self.cell_lines = index.cell_lines
+        self.values = line_values(k)
+        self.threat = k - 1
+        # Every line is worth less than WEIGHT ** (k - 1) unless won.
+        self.scale = MATERIAL_SCORE / (len(self.masks) * WEIGHT ** (k - 1))
+
+        self.x_counts = [popcount(board.x_bits & mask) for mask in self.masks]
+        self.o_counts = [popcount(board.o_bits & mask) for mask in self.masks]
+        self.material = 0
+        self.x_threats = set()
+        self.o_threats = set()
+        for line, (x, o) in enumerate(zip(self.x_counts, self.o_counts)):
+            self.material += self.values[x][o]
+            if x == self.threat and not o:
+                self.x_threats.add(line)
+            elif o == self.threat and not x:
+                self.o_threats.add(line)
+
+    def play(self, index, x_turn):
+        """
+        Update the counts for a move.
+
+        @param index: the cell played.
+        @type index: C{int}
+
+        @param x_turn: whether 'X' played it.
+        @type x_turn: C{bool}
+        """
+        values = self.values
+        threat = self.threat
+        if x_turn:
+            own_counts, other_counts = self.x_counts, self.o_counts
+            own_threats, other_threats = self.x_threats, self.o_threats
+        else:
+            own_counts, other_counts = self.o_counts, self.x_counts
+            own_threats, other_threats = self.o_threats, self.x_threats
+
+        for line in self.cell_lines[index]:
+            own = own_counts[line]
+            other = other_counts[line]
+            own_counts[line] = own + 1
+            if x_turn:
+                self.material += values[own + 1][other] - values[own][other]
+            else:
+                self.material += values[other][own + 1] - values[other][own]
+            if other:
+                other_threats.discard(line)
+            elif own + 1 == threat:
+                own_threats.add(line)
+            elif own == threat:
+                own_threats.discard(line)
+
+    def undo(self, index, x_turn):
+        """
+        Update the counts for a move taken back.
+
+        @param index: the cell freed.
+        @type index: C{int}
+
+        @param x_turn: whether 'X' had played it.
+        @type x_turn: C{bool}
+        """
+        values = self.values
+        threat = self.threat
+        if x_turn:
+            own_counts, other_counts = self.x_counts, self.o_counts
+            own_threats, other_threats = self.x_threats, self.o_threats
+        else:
+            own_counts, other_counts = self.o_counts, self.x_counts
+            own_threats, other_threats = self.o_threats, self.x_threats
+
+        for line in self.cell_lines[index]:
+            own = own_counts[line] - 1
+            other = other_counts[line]
+            own_counts[line] = own
+            if x_turn:
+                self.material += values[own][other] - values[own + 1][other]
+            else:
+                self.material += values[other][own] - values[other][own + 1]
+            if other:
+                if not own and other == threat:
+                    other_threats.add(line)
+            elif own == threat:
+                own_threats.add(line)
+            elif own + 1 == threat:
+                own_threats.discard(line)
+
+    def completions(self, threats):
+        """
+        Return the cells that complete the given threats.
+
+        @param threats: lines missing one cell.
+        @type threats: C{set} of C{int}
+
+        @return: the bitmask of the missing cells.
+        @rtype: C{int}
+        """
+        free = ~(self.board.x_bits | self.board.o_bits)
+        cells = 0
+        for line in threats:
+            cells |= self.masks[line] & free
+        return cells
+
+    def score(self, x_moved):
+        """
+        Score the position for the player who just moved.
+
+        @param x_moved: whether 'X' made the last move.
+        @type x_moved: C{bool}
+
+        @return: the score, strictly between -1.0 and 1.0.
+        @rtype: C{float}
+        """
+        if x_moved:
+            own, other, material = self.x_threats, self.o_threats, self.material
+        else:
+            own, other, material = self.o_threats, self.x_threats, -self.material
+        if other:
+            return -THREAT_SCORE
+        if len(own) > 1 and popcount(self.completions(own)) > 1:
+            return FORK_SCORE
+        return material * self.scale
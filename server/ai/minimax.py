@@ -2,7 +2,24 @@
 Implemetations of the minimax algorithm.
 """
 
-from common.model.board import to_string
+from threading import local
+from time import time
+
+from common import config
+from common.model.board import inverse
+from common.model.board import transforms
+from common.model.bitboard import BitBoard
+from common.model.bitboard import from_string
+from common.model.bitboard import to_string
+from server.ai import vectorized
+from server.ai.evaluation import evaluator
+from server.ai.ordering import MoveOrderer
+from server.ai.transposition import EXACT
+from server.ai.transposition import LOWER
+from server.ai.transposition import UPPER
+from server.ai.transposition import TranspositionTable
+from server.ai.transposition import capacity_for
+from server.ai.transposition import position_key
 
 # The transition point between large and small boards.
 # Used to limit the search depth for large boards.
@@ -14,6 +31,58 @@ MAX_DEPTH_SMALL_BOARD = 9
 # The maximum depth to search to for large boards.
 MAX_DEPTH_LARGE_BOARD = 1
 
+# A bound outside the range of every score returned by a L{Search}.
+LOSS_BOUND = 2.0
+
+# The number of positions visited between checks of a L{Search}s deadline.
+DEADLINE_CHECK_INTERVAL = 256
+
+# Whether the searches of large boards use vectorized leaf evaluation.
+VECTORIZED = config.vectorized_leaves and vectorized.available()
+
+# Per-thread search state, see L{thread_table} and L{thread_nodes}.
+_local = local()
+
+# The table of every thread, see L{tables}.
+_tables = []
+
+def thread_table():
+    """
+    Return the transposition table of the calling thread.
+
+    Every search run by a thread shares its table.  Threads do not share
+    tables with each other because L{TranspositionTable} is not thread-safe.
+
+    @return: the table.
+    @rtype: L{TranspositionTable}
+    """
+    table = getattr(_local, 'table', None)
+    if table is None:
+        table = _local.table = TranspositionTable(
+            capacity_for(config.tt_bytes), config.tt_policy)
+        _tables.append(table)
+    return table
+
+def tables():
+    """
+    Return the tables created by L{thread_table} so far.
+
+    The tables may be in use by their threads, so their counters should only
+    be read.
+
+    @rtype: C{list} of L{TranspositionTable}
+    """
+    return list(_tables)
+
+def thread_nodes():
+    """
+    Return the number of positions visited by the completed or abandoned runs
+    of L{Search}es in the calling thread.
+
+    @rtype: C{int}
+    """
+    return getattr(_local, 'nodes', 0)
+
 def max_depth(board):
     """
     Return the depth to search to for the given L{Board}.
@@ -31,6 +100,87 @@ def max_depth(board):
         if board.side_len() > SMALL_BOARD_CUTOFF
         else MAX_DEPTH_SMALL_BOARD)
 
+class SearchTimeout(Exception):
+    """
+    Raised by a L{Search} whose deadline has passed.
+    """
+    pass
+
+class SearchStats(object):
+    """
+    The work done to find a move, collected by L{best_move_with_stats}.
+
+    Searches only update a L{SearchStats} they are given, so searching
+    without one costs nothing extra.
+
+    @ivar score: the score of the chosen move, or C{None} if the game was over.
+    @type score: C{float}
+
+    @ivar move: the index of the chosen cell, or C{None} if the game was over.
+    @type move: C{int}
+
+    @ivar nodes: the number of positions visited.
+    @type nodes: C{int}
+
+    @ivar leaves: the number of positions scored without searching further:
+        won, drawn or at the depth limit.
+    @type leaves: C{int}
+
+    @ivar heuristic: the number of leaves at the depth limit, scored by the
+        heuristic.  Children scored in a vectorized batch all count as such.
+    @type heuristic: C{int}
+
+    @ivar beta_cutoffs: the number of beta cutoffs at each ply.
+    @type beta_cutoffs: C{list} of C{int}
+
+    @ivar probes: the number of transposition table lookups.
+    @type probes: C{int}
+
+    @ivar hits: the number of lookups that found an entry.
+    @type hits: C{int}
+
+    @ivar depth: the number of plies searched by the last completed search.
+    @type depth: C{int}
+
+    @ivar elapsed: the wall-clock time taken in seconds.
+    @type elapsed: C{float}
+    """
+
+    def __init__(self):
+        """
+        Construct empty L{SearchStats}.
+        """
+        self.score = None
+        self.move = None
+        self.nodes = 0
+        self.leaves = 0
+        self.heuristic = 0
+        self.beta_cutoffs = []
+        self.probes = 0
+        self.hits = 0
+        self.depth = 0
+        self.elapsed = 0.0
+
+    def cutoff(self, ply):
+        """
+        Count a beta cutoff.
+
+        @param ply: the ply at which it happened.
+        @type ply: C{int}
+        """
+        cutoffs = self.beta_cutoffs
+        while len(cutoffs) <= ply:
+            cutoffs.append(0)
+        cutoffs[ply] += 1
+
+    def as_dict(self):
+        """
+        Return the stats as a C{dict}, for logging or JSON.
+
+        @rtype: C{dict}
+        """
+        return dict(vars(self), beta_cutoffs=list(self.beta_cutoffs))
+
 def pluck_score(state_tup):
     """
     Pull the score from the tuple returned from the minimax algorithm.
@@ -40,31 +190,12 @@ def pluck_score(state_tup):
     """
     return state_tup[0][0]
 
-def cached(func):
-    """
-    Decorator for a minimax implementation that memoizes results from calls to
-    the wrapped function.
-
-    @param func: The function to memoize.
-    @type func: C{function}
-    """
-    cache = {}
-    def wrapper(board, *args):
-        key = to_string(board), args
-        if key in cache:
-            return cache[key]
-        val = func(board, *args)
-        cache[key] = val
-        return val
-    return wrapper
-
-@cached
 def minimax(board, is_min_turn):
     """
     A minimal implementation of the minimax alogorithm.
 
-    Does not implement alpha-beta pruning or limit search depth. This
-    implementation is not used but it works.
+    Does not implement alpha-beta pruning, limit search depth or cache
+    results. This implementation is not used but it works.
 
     When recursing on a leaf board instead of returning C{None}
     for the best sub-L{Board} instead return the current L{Board}.  This means
@@ -98,7 +229,6 @@ def minimax(board, is_min_turn):
 
     return (score, sub_board), board
 
-@cached
 def alpha_beta(board, is_min_turn=True, alpha=1, beta=-1, depth=0):
     """
     Implementation of the minimax algorithm with alpha-beta pruning and support
@@ -107,7 +237,8 @@ def alpha_beta(board, is_min_turn=True, alpha=1, beta=-1, depth=0):
     L{Board}s of size 3x3 or less are searched completely.  Larger L{Board}s are
     assigned a heuristic score once MAX_DEPTH_LARGE_BOARD has been reached.
 
-    For details about the handling of leaf boards see L{minimax}.
+    For details about the handling of leaf boards see L{minimax}.  This is the
+    reference implementation; the server uses L{best_move}.
 
     @param board: the L{Board} for which to the determine the best move.
     @type board: L{Board}
@@ -146,3 +277,389 @@ def alpha_beta(board, is_min_turn=True, alpha=1, beta=-1, depth=0):
 
     return sorted(score_list, key=pluck_score)[0 if is_min_turn else -1]
 
+
+def best_move(board, parallel=None, stats=None, table=None):
+    """
+    Return the L{BitBoard} after the best move for the player whose turn it is.
+
+    This is the in-place counterpart of L{alpha_beta}: a single L{Search}
+    plays and undoes moves on one mutable L{BitBoard} so no child boards are
+    allocated while searching.  As with L{alpha_beta}, a leaf board is
+    returned unchanged.
+
+    Boards larger than SMALL_BOARD_CUTOFF are searched by
+    L{iterative_deepening} for config.search_budget_ms milliseconds.
+
+    @param board: the board for which to determine the best move.
+    @type board: L{BitBoard} or L{Board}
+
+    @param parallel: if given, boards larger than SMALL_BOARD_CUTOFF are
+        searched in parallel by its worker processes.
+    @type parallel: L{server.ai.parallel.ParallelSearch}
+
+    @param stats: if given, updated with the work done.  The worker
+        processes of parallel searches do not report theirs, leaving only the
+        score, move, depth and elapsed time.
+    @type stats: L{SearchStats}
+
+    @param table: the transposition table to use in place of that of the
+        calling thread (see L{thread_table}).  Not used by parallel searches.
+    @type table: L{TranspositionTable}
+
+    @return: the board after the best move.
+    @rtype: L{BitBoard}
+    """
+    start = time()
+    if isinstance(board, BitBoard):
+        position = board.copy()
+    else:
+        position = from_string(to_string(board))
+    if position.is_leaf_and_score()[0]:
+        return position
+
+    if table is None:
+        table = thread_table()
+    if position.side_len() > SMALL_BOARD_CUTOFF and parallel is not None:
+        score, move, plies = parallel.iterative_deepening(
+            position, config.search_budget_ms)
+    elif position.side_len() > SMALL_BOARD_CUTOFF:
+        score, move, plies = iterative_deepening(
+            position, config.search_budget_ms, table, stats=stats)
+    else:
+        score, move = Search(position, max_depth(position), table,
+            orderer=MoveOrderer(position.side_len()), stats=stats).run()
+        # The game ends before the depth limit once the board is full.
+        plies = min(max_depth(position) + 1, len(position.empty_cells()))
+    position.play(move)
+    if stats is not None:
+        stats.score, stats.move, stats.depth = score, move, plies
+        stats.elapsed = time() - start
+    return position
+
+def best_move_with_stats(board, parallel=None):
+    """
+    Find the best move as L{best_move} does and report the work it took.
+
+    @return: the board after the best move and the L{SearchStats} of the
+        search.
+    @rtype: C{tuple} of L{BitBoard} and L{SearchStats}
+    """
+    stats = SearchStats()
+    return best_move(board, parallel, stats), stats
+
+def iterative_deepening(board, budget_ms, table=None, run=None, stats=None,
+        cancelled=None):
+    """
+    Search one ply deeper at a time until the time budget runs out.
+
+    The position is searched to 1 ply, then 2, and so on.  Each iteration
+    shares the transposition table so the best moves found by the previous one
+    are tried first, as does the L{MoveOrderer} whose killer moves and history
+    carry over.  The iteration in progress when the budget runs out is
+    abandoned and the result of the last completed one is returned.  The first
+    iteration always completes so that there is a move to return.
+
+    @param board: the position to search.  It is not modified.
+    @type board: L{BitBoard}
+
+    @param budget_ms: the wall-clock time budget in milliseconds.
+    @type budget_ms: C{int}
+
+    @param table: the transposition table to use.
+    @type table: L{TranspositionTable}
+
+    @param run: a function searching an iteration in place of L{Search}.  It is
+        called with the board, the max depth and the deadline (C{None} for the
+        first iteration), must return the score and the best move and may raise
+        L{SearchTimeout}.  See L{server.ai.parallel.ParallelSearch.run}.
+    @type run: C{function}
+
+    @param stats: updated by the searches of every iteration, unless run is
+        given.
+    @type stats: L{SearchStats}
+
+    @param cancelled: abandons the iteration in progress once set, as if the
+        budget had run out.  Not used if run is given.
+    @type cancelled: C{threading.Event}
+
+    @return: the score, the index of the best move and the number of plies
+        searched by the last completed iteration.
+    @rtype: C{tuple} of C{float}, C{int} and C{int}
+    """
+    deadline = time() + budget_ms / 1000.0
+    if run is None:
+        orderer = MoveOrderer(board.side_len())
+        def run(board, max_depth, deadline):
+            position = board.copy()
+            return Search(position, max_depth, table, orderer=orderer,
+                deadline=deadline, vectorized=VECTORIZED,
+                evaluator=evaluator(position, config.heuristic),
+                stats=stats, cancelled=cancelled).run()
+
+    empty = len(board.empty_cells())
+    result = None
+    for plies in range(1, empty + 1):
+        try:
+            score, move = run(
+                board, plies - 1, None if result is None else deadline)
+        except SearchTimeout:
+            break
+        result = score, move, plies
+        # A won or lost score is exact, deeper searches cannot change it.
+        if abs(score) == 1.0:
+            break
+    return result
+
+class Search(object):
+    """
+    Negamax search with alpha-beta pruning over a single mutable L{BitBoard}.
+
+    Scores are from the point of view of the player to move: 1.0 for a win,
+    0.0 for a draw and -1.0 for a loss.  Positions past the depth limit are
+    scored in favour of the player who just moved, by the evaluator if there
+    is one and otherwise with L{BitBoard.heur_score}, matching L{alpha_beta}.
+
+    @ivar board: the position being searched.  Moves are played and undone in
+        place, so it is restored once the search returns.
+    @type board: L{BitBoard}
+
+    @ivar max_depth: see L{max_depth}.
+    @type max_depth: C{int}
+
+    @ivar table: the transposition table consulted and filled by the search,
+        or C{None}.
+    @type table: L{TranspositionTable}
+
+    @ivar symmetry: whether positions are looked up in the table by their
+        canonical form (see L{BitBoard.canonical}) and only symmetry-distinct
+        moves are searched at the root.
+    @type symmetry: C{bool}
+
+    @ivar orderer: ranks the moves of each position, or C{None} to search
+        the transposition table move first and the rest in index order.
+    @type orderer: L{MoveOrderer}
+
+    @ivar deadline: the time, as returned by C{time.time}, after which the
+        search raises L{SearchTimeout}, or C{None}.  The board is left
+        part-way through the search when this happens.
+    @type deadline: C{float}
+
+    @ivar cancelled: when set the search raises L{SearchTimeout} as if its
+        deadline had passed, or C{None}.  Only checked along with the
+        deadline.
+    @type cancelled: C{threading.Event}
+
+    @ivar vectorized: whether the children of positions at the depth limit are
+        scored by L{vectorized.best_child} rather than one by one.  The first
+        child is scored alone and, unless it causes a beta cutoff, the rest
+        all at once.
+    @type vectorized: C{bool}
+
+    @ivar evaluator: kept up to date with every move played on the board and
+        scoring the positions at the depth limit in place of
+        L{BitBoard.heur_score}, or C{None}.  Vectorized evaluation only applies
+        without an evaluator.
+    @type evaluator: L{ThreatEvaluator}
+
+    @ivar stats: updated with the work done by L{run}, or C{None}.
+    @type stats: L{SearchStats}
+
+    @ivar nodes: the number of positions visited so far.
+    @type nodes: C{int}
+    """
+
+    def __init__(self, board, max_depth, table=None, symmetry=True,
+            orderer=None, deadline=None, vectorized=False, evaluator=None,
+            stats=None, cancelled=None):
+        """
+        Construct a L{Search} of the given position.
+
+        @param board: the position to search.
+        @type board: L{BitBoard}
+
+        @param max_depth: see L{max_depth}.
+        @type max_depth: C{int}
+
+        @param table: the transposition table to use.
+        @type table: L{TranspositionTable}
+
+        @param symmetry: whether to exploit the symmetries of the board.
+        @type symmetry: C{bool}
+
+        @param orderer: the move orderer to use.
+        @type orderer: L{MoveOrderer}
+
+        @param deadline: the time after which to abandon the search.
+        @type deadline: C{float}
+
+        @param vectorized: whether to score the children of positions at the
+            depth limit with NumPy.  Requires L{vectorized.available}.
+        @type vectorized: C{bool}
+
+        @param evaluator: the evaluator of the board to use.
+        @type evaluator: L{ThreatEvaluator}
+
+        @param stats: the stats to update.
+        @type stats: L{SearchStats}
+
+        @param cancelled: abandons the search once set.
+        @type cancelled: C{threading.Event}
+        """
+        self.board = board
+        self.max_depth = max_depth
+        self.table = table
+        self.symmetry = symmetry
+        self.orderer = orderer
+        self.deadline = deadline
+        self.cancelled = cancelled
+        self.vectorized = vectorized and evaluator is None
+        self.evaluator = evaluator
+        self.stats = stats
+        self.nodes = 1
+        self.next_check = DEADLINE_CHECK_INTERVAL
+        # Moves are stored in the table relative to the canonical position.
+        self.perms = transforms(board.side_len())
+        self.inverses = [inverse(perm) for perm in self.perms]
+
+    def run(self):
+        """
+        Search the position.  The positions visited are added to the count of
+        L{thread_nodes}.
+
+        @return: the score of the position and the index of the best move.
+        @rtype: C{tuple} of C{float} and C{int}
+        """
+        table = self.table
+        stats = self.stats
+        if stats is not None and table is not None:
+            hits, misses = table.hits, table.misses
+        try:
+            return self.negamax(-LOSS_BOUND, LOSS_BOUND, 0)
+        finally:
+            _local.nodes = thread_nodes() + self.nodes
+            if stats is not None:
+                stats.nodes += self.nodes
+                if table is not None:
+                    stats.hits += table.hits - hits
+                    stats.probes += table.hits - hits + table.misses - misses
+
+    def negamax(self, alpha, beta, depth):
+        """
+        Score the position at the given depth within the window (alpha, beta).
+
+        @return: the score and the best move.
+        @rtype: C{tuple} of C{float} and C{int}
+        """
+        if self.deadline is not None and self.nodes >= self.next_check:
+            self.next_check = self.nodes + DEADLINE_CHECK_INTERVAL
+            if time() > self.deadline or (self.cancelled is not None
+                    and self.cancelled.is_set()):
+                raise SearchTimeout
+
+        board = self.board
+        table = self.table
+        size = board.size()
+        # The number of plies that will be searched below this position.
+        draft = self.max_depth + 1 - depth
+
+        tt_move = None
+        if table is not None:
+            if self.symmetry:
+                x_bits, o_bits, transform = board.canonical()
+            else:
+                x_bits, o_bits, transform = board.x_bits, board.o_bits, 0
+            key = position_key(x_bits, o_bits, size)
+            entry = table.probe(key)
+            if entry is not None:
+                entry_draft, flag, score, tt_move = entry
+                tt_move = self.inverses[transform][tt_move]
+                if entry_draft >= draft and (flag == EXACT
+                        or flag == LOWER and score >= beta
+                        or flag == UPPER and score <= alpha):
+                    return score, tt_move
+
+        last = board.last
+        x_turn = board.x_has_next_turn()
+        full = board.full_mask()
+        if depth == 0 and self.symmetry:
+            moves = board.distinct_moves()
+        else:
+            moves = board.empty_cells()
+        orderer = self.orderer
+        evaluator = self.evaluator
+        stats = self.stats
+        if orderer is not None:
+            if x_turn:
+                orderer.order(board.x_bits, board.o_bits, moves, depth, tt_move)
+            else:
+                orderer.order(board.o_bits, board.x_bits, moves, depth, tt_move)
+        elif tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        is_frontier = depth + 1 > self.max_depth
+
+        original_alpha = alpha
+        best_score, best = -LOSS_BOUND, None
+        # With vectorized evaluation the first child, usually enough for a
+        # cutoff when the moves are well ordered, is still scored alone.
+        batch = is_frontier and self.vectorized and len(moves) > 1
+        for move in moves[:1] if batch else moves:
+            self.nodes += 1
+            board.play(move, x_turn)
+            if evaluator is not None:
+                evaluator.play(move, x_turn)
+            if board.is_win_at(move):
+                score = 1.0
+                if stats is not None:
+                    stats.leaves += 1
+            elif board.x_bits | board.o_bits == full:
+                score = 0.0
+                if stats is not None:
+                    stats.leaves += 1
+            elif is_frontier:
+                score = (board.heur_score() if evaluator is None
+                    else evaluator.score(x_turn))
+                if stats is not None:
+                    stats.leaves += 1
+                    stats.heuristic += 1
+            else:
+                score = -self.negamax(-beta, -alpha, depth + 1)[0]
+            board.undo(move, last)
+            if evaluator is not None:
+                evaluator.undo(move, x_turn)
+
+            if score > best_score:
+                best_score, best = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if orderer is not None:
+                            orderer.cutoff(move, depth, draft)
+                        if stats is not None:
+                            stats.cutoff(depth)
+                        break
+
+        if batch and alpha < beta:
+            self.nodes += len(moves) - 1
+            score, move = vectorized.best_child(board, moves[1:], x_turn)
+            if stats is not None:
+                stats.leaves += len(moves) - 1
+                stats.heuristic += len(moves) - 1
+            if score > best_score:
+                best_score, best = score, move
+                if score >= beta:
+                    if orderer is not None:
+                        orderer.cutoff(move, depth, draft)
+                    if stats is not None:
+                        stats.cutoff(depth)
+
+        if table is not None:
+            if best_score <= original_alpha:
+                flag = UPPER
+            elif best_score >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            table.store(
+                key, draft, flag, best_score, self.perms[transform][best])
+        return best_score, best
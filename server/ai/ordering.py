@@ -0,0 +1,160 @@
+"""
+Move ordering for the minimax search.
+
+Alpha-beta pruning cuts off the most when the best move is searched first.  A
+L{MoveOrderer} ranks the moves of a position from the most to the least
+promising using, in order of priority:
+
+    1. the best move stored in the transposition table,
+    2. moves that win immediately,
+    3. moves that block an immediate win of the opponent,
+    4. killer moves: moves that caused a cutoff at the same ply elsewhere,
+    5. the history heuristic: how often and how deep a move caused cutoffs,
+    6. a static prior favouring the centre and corners, the cells on the most
+       lines.  On an empty board only this applies.
+"""
+
+from common.model.lines import line_index
+
+# Rank bonuses, chosen so that each category outranks all of the ones after it.
+TT_MOVE = 1 << 50
+WIN = 1 << 49
+BLOCK = 1 << 48
+FIRST_KILLER = 1 << 47
+SECOND_KILLER = 1 << 46
+
+# The weight of the history score relative to the static prior.
+HISTORY_WEIGHT = 1 << 4
+
+def static_priors(side_len):
+    """
+    Return the static prior of every cell: the number of lines through it.
+
+    @param side_len: the side length of the board.
+    @type side_len: C{int}
+
+    @return: the prior of each cell.
+    @rtype: C{list} of C{int}
+    """
+    return [len(lines) for lines in line_index(side_len).cell_lines]
+
+class MoveOrderer(object):
+    """
+    Ranks moves and learns from the cutoffs of a search.
+
+    A L{MoveOrderer} can be shared by successive searches of the same game, as
+    L{iterative_deepening} does, so that what one iteration learns orders the
+    next.
+
+    @ivar killers: the two most recent moves that caused a cutoff at each ply.
+    @type killers: C{list} of C{list} of C{int}
+
+    @ivar history: for each cell the sum of the squared drafts of the cutoffs
+        it caused.
+    @type history: C{list} of C{int}
+
+    @ivar priors: see L{static_priors}.
+    @type priors: C{list} of C{int}
+    """
+
+    def __init__(self, side_len):
+        """
+        Construct a L{MoveOrderer} for boards of the given side length.
+
+        @param side_len: the side length of the board.
+        @type side_len: C{int}
+        """
+        size = side_len ** 2
+        self.killers = [[None, None] for _ in range(size + 1)]
+        self.history = [0] * size
+        self.priors = static_priors(side_len)
+        self.cell_masks = line_index(side_len).cell_masks
+
+    def rank(self, own_bits, other_bits, move, ply, tt_move):
+        """
+        Rank one move; higher ranks are searched first.
+
+        @param own_bits: the cells of the player to move.
+        @type own_bits: C{int}
+
+        @param other_bits: the cells of the opponent.
+        @type other_bits: C{int}
+
+        @param move: the blank cell to rank.
+        @type move: C{int}
+
+        @param ply: the number of moves made since the root of the search.
+        @type ply: C{int}
+
+        @param tt_move: the best move from the transposition table, or C{None}.
+        @type tt_move: C{int}
+
+        @return: the rank.
+        @rtype: C{int}
+        """
+        if move == tt_move:
+            return TT_MOVE
+
+        rank = self.history[move] * HISTORY_WEIGHT + self.priors[move]
+        bit = 1 << move
+        for mask in self.cell_masks[move]:
+            if (own_bits | bit) & mask == mask:
+                return rank + WIN
+            if (other_bits | bit) & mask == mask:
+                # OR rather than add: a move blocking two lines gets the bonus
+                # once, since twice BLOCK would equal WIN.
+                rank |= BLOCK
+
+        killers = self.killers[ply]
+        if move == killers[0]:
+            rank += FIRST_KILLER
+        elif move == killers[1]:
+            rank += SECOND_KILLER
+        return rank
+
+    def order(self, own_bits, other_bits, moves, ply, tt_move=None):
+        """
+        Sort moves from the most to the least promising.
+
+        @param own_bits: the cells of the player to move.
+        @type own_bits: C{int}
+
+        @param other_bits: the cells of the opponent.
+        @type other_bits: C{int}
+
+        @param moves: the blank cells to order.  Sorted in place.
+        @type moves: C{list} of C{int}
+
+        @param ply: the number of moves made since the root of the search.
+        @type ply: C{int}
+
+        @param tt_move: the best move from the transposition table, or C{None}.
+        @type tt_move: C{int}
+
+        @return: moves
+        @rtype: C{list} of C{int}
+        """
+        rank = self.rank
+        moves.sort(
+            key=lambda move: rank(own_bits, other_bits, move, ply, tt_move),
+            reverse=True)
+        return moves
+
+    def cutoff(self, move, ply, draft):
+        """
+        Record that a move caused a beta cutoff.
+
+        @param move: the move.
+        @type move: C{int}
+
+        @param ply: the number of moves made since the root of the search.
+        @type ply: C{int}
+
+        @param draft: the number of plies searched below the position.
+        @type draft: C{int}
+        """
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[move] += draft * draft
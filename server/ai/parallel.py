@@ -0,0 +1,193 @@
+"""
+Root-parallel minimax search over a pool of processes.
+
+The symmetry-distinct root moves of a position are searched concurrently, one
+task per move, by a C{multiprocessing} pool.  The best score found so far is
+kept in shared memory and every task reads it as its alpha bound, so moves
+searched later are cut off by the results of moves searched earlier just as
+they would be in L{Search}.
+
+The result is the same as that of a sequential L{Search} without move
+ordering: the highest score, and the first root move in index order that
+achieves it.
+"""
+
+from multiprocessing import Pool
+from multiprocessing import Value
+from threading import Lock
+
+from common import config
+from common.model.bitboard import BitBoard
+from server.ai.evaluation import evaluator
+from server.ai.minimax import LOSS_BOUND
+from server.ai.minimax import Search
+from server.ai.minimax import SearchTimeout
+from server.ai.minimax import VECTORIZED
+from server.ai.minimax import iterative_deepening
+from server.ai.ordering import MoveOrderer
+from server.ai.transposition import TranspositionTable
+from server.ai.transposition import capacity_for
+
+# Worker process state, set by _init_worker.
+# The best root score found so far by the current job, shared by all workers.
+_alpha = None
+# The transposition table of this worker and the job it holds entries for.
+_table = None
+_job = None
+
+def _init_worker(alpha):
+    """
+    Set up a worker process of the pool.
+
+    @param alpha: the shared best root score.
+    @type alpha: C{multiprocessing.Value}
+    """
+    global _alpha, _table
+    _alpha = alpha
+    _table = TranspositionTable(capacity_for(config.tt_bytes), config.tt_policy)
+
+def _search_move(task):
+    """
+    Score one root move within the shared alpha bound.
+
+    The transposition table is cleared whenever a new job starts so that
+    deeper entries from earlier searches cannot change the scores, which keeps
+    the result identical to the sequential search.
+
+    @param task: the job number, the side length, x_bits and o_bits of the
+        root, the root move, the max depth and the deadline.
+    @type task: C{tuple}
+
+    @return: the move, its score and whether the score is exact rather than
+        an upper bound.  The score is C{None} if the deadline passed.
+    @rtype: C{tuple} of C{int}, C{float} and C{bool}
+    """
+    global _job
+    job, side, x_bits, o_bits, move, max_depth, deadline = task
+    if job != _job:
+        _table.clear()
+        _job = job
+
+    board = BitBoard(side, x_bits, o_bits)
+    x_moved = board.x_has_next_turn()
+    board.play(move)
+    evaluation = evaluator(board, config.heuristic)
+    alpha = _alpha.value
+    if board.is_win_at(move):
+        score = 1.0
+    elif board.is_draw():
+        score = 0.0
+    elif max_depth < 1 and evaluation is not None:
+        score = evaluation.score(x_moved)
+    elif max_depth < 1:
+        score = board.heur_score()
+    else:
+        search = Search(board, max_depth - 1, _table,
+            orderer=MoveOrderer(side), deadline=deadline,
+            vectorized=VECTORIZED, evaluator=evaluation)
+        try:
+            score = -search.negamax(-LOSS_BOUND, -alpha, 0)[0]
+        except SearchTimeout:
+            return move, None, False
+        if score <= alpha:
+            return move, score, False
+
+    with _alpha.get_lock():
+        if score > _alpha.value:
+            _alpha.value = score
+    return move, score, True
+
+class ParallelSearch(object):
+    """
+    A pool of worker processes that search root moves in parallel.
+
+    Searches are serialized: the shared alpha bound belongs to one search at a
+    time.
+
+    @ivar workers: the number of worker processes.
+    @type workers: C{int}
+    """
+
+    def __init__(self, workers):
+        """
+        Start the worker processes.
+
+        @param workers: the number of worker processes.
+        @type workers: C{int}
+        """
+        self.workers = workers
+        self.alpha = Value('d', -LOSS_BOUND)
+        self.pool = Pool(workers, _init_worker, (self.alpha,))
+        self.lock = Lock()
+        self.jobs = 0
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        self.pool.terminate()
+        self.pool.join()
+
+    def run(self, board, max_depth, deadline=None):
+        """
+        Search a position to the given depth.
+
+        @param board: the position to search.  It is not modified.
+        @type board: L{BitBoard}
+
+        @param max_depth: see L{server.ai.minimax.max_depth}.
+        @type max_depth: C{int}
+
+        @param deadline: the time after which to abandon the search.
+        @type deadline: C{float}
+
+        @raise SearchTimeout: if the deadline passed.
+
+        @return: the score of the position and the index of the best move.
+        @rtype: C{tuple} of C{float} and C{int}
+        """
+        with self.lock:
+            self.jobs += 1
+            self.alpha.value = -LOSS_BOUND
+            tasks = [
+                (self.jobs, board.side, board.x_bits, board.o_bits, move,
+                    max_depth, deadline)
+                for move in board.distinct_moves()]
+            results = self.pool.map(_search_move, tasks, chunksize=1)
+
+        if any([score is None for move, score, exact in results]):
+            raise SearchTimeout
+
+        best_score = max([score for move, score, exact in results if exact])
+        for move, score, exact in results:
+            # A move that failed low against an equal alpha may tie the best
+            # score; only an exact score decides whether it comes first.
+            if not exact and score >= best_score:
+                score = self.rescore(board, move, max_depth)
+            if score == best_score:
+                return best_score, move
+
+    def rescore(self, board, move, max_depth):
+        """
+        Calculate the exact score of a root move in this process.
+
+        @return: the score of the move for the player to move at the root.
+        @rtype: C{float}
+        """
+        child = board.copy()
+        child.play(move)
+        search = Search(child, max_depth - 1,
+            TranspositionTable(capacity_for(config.tt_bytes), config.tt_policy),
+            evaluator=evaluator(child, config.heuristic))
+        return -search.run()[0]
+
+    def iterative_deepening(self, board, budget_ms):
+        """
+        Search with L{server.ai.minimax.iterative_deepening}, each iteration in
+        parallel.
+
+        @return: the score, the index of the best move and the number of plies
+            searched by the last completed iteration.
+        @rtype: C{tuple} of C{float}, C{int} and C{int}
+        """
+        return iterative_deepening(board, budget_ms, run=self.run)
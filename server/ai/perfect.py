@@ -0,0 +1,132 @@
+"""
+A precomputed table of perfect moves for 3x3 boards.
+
+The 3x3 game tree is small enough to solve once, offline.  The best move of
+every reachable position is written to a file holding one byte per position,
+indexed by the position number (see L{position_number}).  The server memory
+maps the file so a 3x3 move is a single lookup: there is nothing to warm up and
+the pages are shared by every server process.
+
+To regenerate the table run from the base directory:
+    PYTHONPATH=. python server/ai/perfect.py
+"""
+
+import mmap
+import os
+
+from common.model.bitboard import from_string
+from common.model.bitboard import to_string
+from server.ai.minimax import MAX_DEPTH_SMALL_BOARD
+from server.ai.minimax import Search
+from server.ai.ordering import MoveOrderer
+from server.ai.transposition import TranspositionTable
+
+# The side length of the boards in the table.
+SIDE_LEN = 3
+
+# The byte stored for positions without a move: unreachable or game over.
+NO_MOVE = 255
+
+# The default location of the table file.
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'perfect3.bin')
+
+# The base-3 digit of each cell state.
+DIGITS = {' ': 0, 'X': 1, 'O': 2}
+
+def position_number(string):
+    """
+    Return the base-3 number of a board string.
+
+    Cell i contributes its digit (' ' = 0, 'X' = 1, 'O' = 2) times 3 ** i.
+
+    @param string: the board string.
+    @type string: C{str}
+
+    @return: the position number.
+    @rtype: C{int}
+    """
+    number = 0
+    for state in reversed(string):
+        number = number * 3 + DIGITS[state]
+    return number
+
+def reachable(string, seen):
+    """
+    Collect every position reachable from the given one that is not over.
+
+    @param string: the board string to start from.
+    @type string: C{str}
+
+    @param seen: the board strings collected so far.  Updated in place.
+    @type seen: C{set} of C{str}
+    """
+    if string in seen:
+        return
+    board = from_string(string)
+    if board.is_leaf_and_score()[0]:
+        return
+    seen.add(string)
+    for child in board.children():
+        reachable(to_string(child), seen)
+
+def generate(path=DEFAULT_PATH):
+    """
+    Solve every reachable 3x3 position and write the table to a file.
+
+    @param path: the file to write.
+    @type path: C{str}
+
+    @return: the number of positions solved.
+    @rtype: C{int}
+    """
+    positions = set()
+    reachable(' ' * SIDE_LEN ** 2, positions)
+
+    table = TranspositionTable(2 ** 16)
+    moves = bytearray([NO_MOVE] * 3 ** (SIDE_LEN ** 2))
+    for string in sorted(positions):
+        board = from_string(string)
+        score, move = Search(board, MAX_DEPTH_SMALL_BOARD, table,
+            orderer=MoveOrderer(SIDE_LEN)).run()
+        moves[position_number(string)] = move
+
+    with open(path, 'wb') as table_file:
+        table_file.write(bytes(moves))
+    return len(positions)
+
+class PerfectTable(object):
+    """
+    Read-only view of a table written by L{generate}.
+
+    @ivar moves: the memory mapped table.
+    @type moves: C{mmap.mmap}
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Memory map the table at the given path.
+
+        @param path: the table file.
+        @type path: C{str}
+        """
+        with open(path, 'rb') as table_file:
+            self.moves = mmap.mmap(
+                table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def lookup(self, string):
+        """
+        Return the perfect move for a 3x3 board string.
+
+        @param string: the board string.
+        @type string: C{str}
+
+        @return: the index of the cell to play, or C{None} if the table holds
+            no move because the game is over or the position is unreachable.
+        @rtype: C{int} or C{None}
+        """
+        number = position_number(string)
+        move = ord(self.moves[number:number + 1])
+        return None if move == NO_MOVE else move
+
+if __name__ == '__main__':
+    print('Solved {0} positions'.format(generate()))
@@ -0,0 +1,204 @@
+"""
+A bounded transposition table for the minimax search.
+
+Each position has at most one entry holding the score found for it, whether
+that score is exact or only a bound, the depth that was searched below it and
+the index of the best move.  The table never holds more than its capacity of
+entries; once full, entries are replaced according to its policy.
+"""
+
+import struct
+import sys
+from collections import OrderedDict
+
+# Entry flags.
+# The score is the exact minimax score of the position.
+EXACT = 0
+# The search failed high: the true score is at least the stored score.
+LOWER = 1
+# The search failed low: the true score is at most the stored score.
+UPPER = 2
+
+# Replacement policies.
+# Entries hash to a fixed slot and the deeper search wins a collision.
+DEPTH_PREFERRED = 'depth'
+# The least recently probed or stored entry is evicted.
+LRU = 'lru'
+
+# An estimate of the bytes held by one entry: its key, the entry and, in a
+# slot, the pair holding both.  Measured on a 4x4 position.
+ENTRY_BYTES = (sys.getsizeof(1 << 32) + sys.getsizeof((0, EXACT, 0.5, 0))
+    + sys.getsizeof(0.5) + sys.getsizeof((0, None)))
+
+# The bytes of the reference to each slot held by a table, full or not.
+SLOT_BYTES = struct.calcsize('P')
+
+def position_key(x_bits, o_bits, size):
+    """
+    Pack a position into a single integer key.
+
+    A sentinel bit above both bitmasks keeps the keys of boards of different
+    sizes distinct so that one table can serve every board size.
+
+    @param x_bits: the cells occupied by 'X'.
+    @type x_bits: C{int}
+
+    @param o_bits: the cells occupied by 'O'.
+    @type o_bits: C{int}
+
+    @param size: the number of cells on the board.
+    @type size: C{int}
+
+    @return: the key.
+    @rtype: C{int}
+    """
+    return 1 << (size << 1) | o_bits << size | x_bits
+
+def capacity_for(max_bytes):
+    """
+    Return the capacity of a table whose estimated memory, see
+    L{TranspositionTable.memory}, stays within a number of bytes once full.
+
+    @param max_bytes: the memory allowed.
+    @type max_bytes: C{int}
+
+    @return: the capacity, at least 1.
+    @rtype: C{int}
+    """
+    return max(1, max_bytes // (ENTRY_BYTES + SLOT_BYTES))
+
+class TranspositionTable(object):
+    """
+    Transposition table with a fixed capacity.
+
+    Entries are C{tuple}s of (depth, flag, score, move) where depth is the
+    number of plies searched below the position, flag is one of L{EXACT},
+    L{LOWER} or L{UPPER} and move is the index of the best cell to play.
+
+    @ivar capacity: the maximum number of entries.
+    @type capacity: C{int}
+
+    @ivar policy: the replacement policy, L{DEPTH_PREFERRED} or L{LRU}.
+    @type policy: C{str}
+
+    @ivar hits: the number of probes that found an entry.
+    @type hits: C{int}
+
+    @ivar misses: the number of probes that found nothing.
+    @type misses: C{int}
+
+    @ivar evictions: the number of entries replaced by a different position.
+    @type evictions: C{int}
+    """
+
+    def __init__(self, capacity, policy=DEPTH_PREFERRED):
+        """
+        Construct an empty L{TranspositionTable}.
+
+        @param capacity: the maximum number of entries.
+        @type capacity: C{int}
+
+        @param policy: the replacement policy.
+        @type policy: C{str}
+        """
+        if policy not in (DEPTH_PREFERRED, LRU):
+            raise ValueError('Unknown replacement policy {0!r}'.format(policy))
+        self.capacity = capacity
+        self.policy = policy
+        self.clear()
+
+    def clear(self):
+        """
+        Remove every entry and reset the counters.
+        """
+        if self.policy == LRU:
+            self.entries = OrderedDict()
+        else:
+            self.slots = [None] * self.capacity
+            self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        if self.policy == LRU:
+            return len(self.entries)
+        return self.used
+
+    def memory(self):
+        """
+        Estimate the memory held by the table.
+
+        @return: the estimated size in bytes, see ENTRY_BYTES.
+        @rtype: C{int}
+        """
+        if self.policy == LRU:
+            container = sys.getsizeof(self.entries)
+        else:
+            container = sys.getsizeof(self.slots)
+        return container + len(self) * ENTRY_BYTES
+
+    def probe(self, key):
+        """
+        Look up the entry for a position.
+
+        @param key: the position key, see L{position_key}.
+        @type key: C{int}
+
+        @return: the entry or C{None}.
+        @rtype: C{tuple} or C{None}
+        """
+        if self.policy == LRU:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.entries[key] = entry
+        else:
+            slot = self.slots[hash(key) % self.capacity]
+            entry = slot[1] if slot is not None and slot[0] == key else None
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def store(self, key, depth, flag, score, move):
+        """
+        Record the result of searching a position.
+
+        Under L{DEPTH_PREFERRED} a result is dropped if its slot holds a
+        different position that was searched deeper.
+
+        @param key: the position key, see L{position_key}.
+        @type key: C{int}
+
+        @param depth: the number of plies searched below the position.
+        @type depth: C{int}
+
+        @param flag: L{EXACT}, L{LOWER} or L{UPPER}.
+        @type flag: C{int}
+
+        @param score: the score found.
+        @type score: C{float}
+
+        @param move: the index of the best move.
+        @type move: C{int}
+        """
+        entry = depth, flag, score, move
+        if self.policy == LRU:
+            entries = self.entries
+            if entries.pop(key, None) is None and len(entries) >= self.capacity:
+                entries.popitem(last=False)
+                self.evictions += 1
+            entries[key] = entry
+            return
+
+        index = hash(key) % self.capacity
+        slot = self.slots[index]
+        if slot is None:
+            self.used += 1
+        elif slot[0] != key:
+            if slot[1][0] > depth:
+                return
+            self.evictions += 1
+        self.slots[index] = key, entry
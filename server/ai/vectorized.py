@@ -0,0 +1,143 @@
+"""
+NumPy evaluation of many boards at once.
+
+Boards are encoded as rows of an C{int8} array of shape (N, side_len ** 2)
+holding 1 for 'X', -1 for 'O' and 0 for ' '.  Win flags, draw flags and
+heuristic scores of the whole batch are then two matrix products with the line
+incidence matrix of the board size, whose entry (i, j) is 1 when cell i lies on
+line j.  The products are taken in C{float32}, which NumPy hands to BLAS and
+which holds the small counts involved exactly.
+
+NumPy is optional; L{available} reports whether it could be imported.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from common.model.lines import line_index
+
+# Line incidence matrices keyed by L{LineIndex}.
+_incidences = {}
+
+# Row i holds the 8 bits of the byte i, least significant first.
+_byte_bits = None
+
+def available():
+    """
+    Whether NumPy could be imported.
+
+    @rtype: C{bool}
+    """
+    return numpy is not None
+
+def incidence(side_len):
+    """
+    Return the line incidence matrix for the given side length.
+
+    @param side_len: the side length of the board.
+    @type side_len: C{int}
+
+    @return: an array of shape (side_len ** 2, number of lines).
+    @rtype: C{numpy.ndarray}
+    """
+    index = line_index(side_len)
+    if index not in _incidences:
+        matrix = numpy.zeros((side_len ** 2, len(index.lines)), numpy.float32)
+        for j, line in enumerate(index.lines):
+            matrix[list(line), j] = 1
+        _incidences[index] = matrix
+    return _incidences[index]
+
+def unpack(bits, size):
+    """
+    Convert a bitmask to an array with one 0 or 1 entry per cell.
+
+    @param bits: the bitmask.
+    @type bits: C{int}
+
+    @param size: the number of cells.
+    @type size: C{int}
+
+    @rtype: C{numpy.ndarray}
+    """
+    global _byte_bits
+    if _byte_bits is None:
+        _byte_bits = ((numpy.arange(256)[:, None] >> numpy.arange(8)) & 1)\
+            .astype(numpy.int8)
+    chunks = [bits >> shift & 255 for shift in range(0, size, 8)]
+    return _byte_bits[chunks].ravel()[:size]
+
+def encode(boards):
+    """
+    Encode L{BitBoard}s of the same size as an array.
+
+    @param boards: the boards.
+    @type boards: C{list} of L{BitBoard}
+
+    @return: an C{int8} array of shape (len(boards), size).
+    @rtype: C{numpy.ndarray}
+    """
+    size = boards[0].size()
+    return numpy.array([
+        unpack(board.x_bits, size) - unpack(board.o_bits, size)
+        for board in boards], numpy.int8)
+
+def evaluate(cells, side_len):
+    """
+    Evaluate a batch of encoded boards.
+
+    @param cells: boards encoded as by L{encode}.
+    @type cells: C{numpy.ndarray}
+
+    @param side_len: the side length of the boards.
+    @type side_len: C{int}
+
+    @return: the win flags, the draw flags and the heuristic scores (see
+        L{BitBoard.heur_score}) of the boards.  A board is a draw if it is full
+        without a win.
+    @rtype: C{tuple} of three C{numpy.ndarray}
+    """
+    matrix = incidence(side_len)
+    k = line_index(side_len).win_length
+    signed = cells.astype(numpy.float32)
+    # A line is won when all its k cells hold the same symbol, that is when
+    # its sum is +k or -k.
+    sums = signed.dot(matrix)
+    taken = numpy.abs(signed).dot(matrix)
+    wins = (numpy.abs(sums) == k).any(axis=1)
+    draws = ~wins & (cells != 0).all(axis=1)
+    scores = taken.max(axis=1).astype(numpy.float64) / (k * 2.0)
+    return wins, draws, scores
+
+def best_child(board, moves, x_turn):
+    """
+    Score every child of a board and return the best.
+
+    Children are scored as in L{Search.negamax} at the depth limit: 1.0 for a
+    win, 0.0 for a draw and the heuristic score otherwise, all from the point
+    of view of the player making the move.
+
+    @param board: the position.
+    @type board: L{BitBoard}
+
+    @param moves: the moves to score.
+    @type moves: C{list} of C{int}
+
+    @param x_turn: whether 'X' is to move.
+    @type x_turn: C{bool}
+
+    @return: the best score and the first move achieving it.
+    @rtype: C{tuple} of C{float} and C{int}
+    """
+    size = board.size()
+    base = unpack(board.x_bits, size) - unpack(board.o_bits, size)
+    cells = numpy.tile(base, (len(moves), 1))
+    cells[numpy.arange(len(moves)), moves] = 1 if x_turn else -1
+
+    wins, draws, scores = evaluate(cells, board.side_len())
+    scores[draws] = 0.0
+    scores[wins] = 1.0
+    best = int(scores.argmax())
+    return float(scores[best]), moves[best]
@@ -0,0 +1,97 @@
+"""
+A bounded least recently used cache.
+"""
+
+import sys
+from collections import OrderedDict
+
+class LRUCache(object):
+    """
+    Mapping with a fixed capacity that evicts the least recently used entry.
+
+    @ivar capacity: the maximum number of entries.
+    @type capacity: C{int}
+
+    @ivar hits: the number of lookups that found an entry.
+    @type hits: C{int}
+
+    @ivar misses: the number of lookups that found nothing.
+    @type misses: C{int}
+
+    @ivar evictions: the number of entries removed to make room.
+    @type evictions: C{int}
+
+    @ivar size: the total size in bytes of the keys and values held.
+    @type size: C{int}
+    """
+
+    def __init__(self, capacity):
+        """
+        Construct an empty L{LRUCache}.
+
+        @param capacity: the maximum number of entries.
+        @type capacity: C{int}
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Look up a value, marking it as the most recently used.
+
+        @param key: the key.
+
+        @return: the value or C{None}.
+        """
+        value = self.entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry if full.
+
+        @param key: the key.
+
+        @param value: the value.  Must not be C{None}.
+        """
+        entries = self.entries
+        old = entries.pop(key, None)
+        if old is not None:
+            self.size -= sys.getsizeof(key) + sys.getsizeof(old)
+        elif len(entries) >= self.capacity:
+            evicted = entries.popitem(last=False)
+            self.size -= sys.getsizeof(evicted[0]) + sys.getsizeof(evicted[1])
+            self.evictions += 1
+        entries[key] = value
+        self.size += sys.getsizeof(key) + sys.getsizeof(value)
+
+    def memory(self):
+        """
+        Return the memory held by the cache.
+
+        @return: the size in bytes of the entries and their container.
+        @rtype: C{int}
+        """
+        return sys.getsizeof(self.entries) + self.size
+
+    def hit_rate(self):
+        """
+        Return the fraction of lookups that found an entry.
+
+        @return: the hit rate, 0.0 before the first lookup.
+        @rtype: C{float}
+        """
+        lookups = self.hits + self.misses
+        return self.hits / float(lookups) if lookups else 0.0
@@ -1,25 +1,458 @@
 """
 Stateless server implementation.
+
+Boards that can be answered immediately, from the perfect table or because the
+game is over, are answered on the reactor thread.  Everything else is searched
+on a pool of config.search_threads threads so that a slow search never stalls
+the other clients.
+
+What the server is doing is reported by /metrics, see L{server.metrics}.
+Clients may also play whole games over one connection, see L{server.session}.
 """
 
+import json
+import os
+from hashlib import md5
+
 from twisted.internet import reactor
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+from twisted.web.http import BAD_REQUEST
+from twisted.web.http import NOT_MODIFIED
+from twisted.web.server import NOT_DONE_YET
 from twisted.web.server import Site
 from twisted.web.resource import Resource
 
 from common import config
-from common.model import board
-from server.ai.minimax import alpha_beta
+from common import wire
+from common.log import ModuleLogger
+from common.log import buffer_log
+from common.log import unbuffer_log
+from common.model import bitboard as board
+from common.model.lines import win_length
+from server.ai import perfect
+from server.ai.minimax import best_move
+from server.ai.minimax import tables
+from server.ai.minimax import thread_nodes
+from server.ai.parallel import ParallelSearch
+from server.cache import LRUCache
+from server.session import SessionFactory
+from server.metrics import Metrics
+
+# Logs as this module.
+logger = ModuleLogger()
+
+# Perfect moves for 3x3 boards, memory mapped if the table has been generated.
+perfect_table = (perfect.PerfectTable()
+    if os.path.exists(perfect.DEFAULT_PATH) else None)
+
+# The worker processes searching large boards, if config.search_workers > 1.
+parallel_search = None
+
+# Response bodies of GetMove keyed by the board query value.
+response_cache = LRUCache(config.response_cache_size)
+
+# The threads running searches off the reactor thread.
+search_pool = ThreadPool(1, config.search_threads, 'search')
+
+# The threads pondering for sessions, see L{server.session}.
+ponder_pool = ThreadPool(1, config.ponder_threads, 'ponder')
+
+# The figures reported by /metrics.
+metrics = Metrics()
+
+def transposition_hit_rate():
+    """
+    Return the fraction of probes of the search threads' transposition tables
+    that found an entry.
+
+    @return: the hit rate, 0.0 before the first probe.
+    @rtype: C{float}
+    """
+    hits = sum([table.hits for table in tables()])
+    probes = hits + sum([table.misses for table in tables()])
+    return hits / float(probes) if probes else 0.0
+
+metrics.gauge('ttt_response_cache_hit_ratio',
+    'Fraction of lookups in the response cache that found an entry.',
+    response_cache.hit_rate)
+metrics.gauge('ttt_response_cache_bytes',
+    'Memory held by the response cache.',
+    response_cache.memory)
+metrics.gauge('ttt_transposition_hit_ratio',
+    'Fraction of transposition table probes that found an entry.',
+    transposition_hit_rate)
+metrics.gauge('ttt_transposition_bytes',
+    'Estimated memory held by the transposition tables.',
+    lambda: sum([table.memory() for table in tables()]))
+
+def cheap_move(board_string):
+    """
+    Calculate the servers move if that does not require a search.
+
+    @param board_string: the string representation of the current board.
+    @type board_string: C{str}
+
+    @return: the result of L{find_move}, or C{None} if the board needs to be
+        searched.
+    @rtype: C{str} or C{None}
+    """
+    position = cheap_position(board.from_string(board_string))
+    return None if position is None else board.to_string(position)
+
+def cheap_position(position):
+    """
+    The L{BitBoard} counterpart of L{cheap_move}.
+
+    @param position: the current board, left unchanged.
+    @type position: L{BitBoard}
+
+    @return: the result of L{find_position}, or C{None} if the board needs to
+        be searched.
+    @rtype: L{BitBoard} or C{None}
+    """
+    # The perfect table only holds moves for the classic three in a row.
+    if (perfect_table is not None and position.side_len() == perfect.SIDE_LEN
+            and win_length(perfect.SIDE_LEN) == perfect.SIDE_LEN):
+        move = perfect_table.lookup(board.to_string(position))
+        if move is not None:
+            position = position.copy()
+            position.play(move)
+            return position
+    if position.is_leaf_and_score()[0]:
+        return position
+    return None
+
+def find_move(board_string):
+    """
+    Calculate the servers move.
+
+    3x3 boards are answered from the L{perfect.PerfectTable}, anything else is
+    searched by L{best_move}, in parallel if the server was started with
+    search workers.  The positions searched in this process are recorded in
+    metrics.nodes.
+
+    @param board_string: the string representation of the current board.
+    @type board_string: C{str}
+
+    @return: the string representation of the board after the servers move, or
+        of the unchanged board if the game is over.
+    @rtype: C{str}
+    """
+    return board.to_string(find_position(board.from_string(board_string)))
+
+def find_position(position):
+    """
+    The L{BitBoard} counterpart of L{find_move}.
+
+    @param position: the current board, left unchanged.
+    @type position: L{BitBoard}
+
+    @return: the board after the servers move, or the unchanged board if the
+        game is over.
+    @rtype: L{BitBoard}
+    """
+    after = cheap_position(position)
+    if after is not None:
+        return after
+    nodes = thread_nodes()
+    after = best_move(position, parallel_search)
+    metrics.nodes.observe(thread_nodes() - nodes)
+    return after
+
+def find_moves(board_strings):
+    """
+    Calculate the servers move for many boards.
+
+    Each distinct board is searched once.  The searches share the servers
+    transposition table, so positions common to several boards are only
+    solved once as well.
+
+    @param board_strings: the string representations of the boards.
+    @type board_strings: C{list} of C{str}
+
+    @return: the result of L{find_move} for each board, in order.
+    @rtype: C{list} of C{str}
+    """
+    moves = {}
+    for board_string in board_strings:
+        if board_string not in moves:
+            moves[board_string] = find_move(board_string)
+    return [moves[board_string] for board_string in board_strings]
+
+def find_positions(positions):
+    """
+    The L{BitBoard} counterpart of L{find_moves}.
+
+    @param positions: the boards.
+    @type positions: C{list} of L{BitBoard}
+
+    @return: the result of L{find_position} for each board, in order.
+    @rtype: C{list} of L{BitBoard}
+    """
+    moves = {}
+    keys = [(position.side_len(), position.x_bits, position.o_bits)
+        for position in positions]
+    for key, position in zip(keys, positions):
+        if key not in moves:
+            moves[key] = find_position(position)
+    return [moves[key] for key in keys]
+
+def move_index(board_string, new_board_string):
+    """
+    Find the cell the server played.
+
+    @param board_string: the string representation of the board.
+    @type board_string: C{str}
+
+    @param new_board_string: the result of L{find_move} for the board.
+    @type new_board_string: C{str}
+
+    @return: the index of the cell played, or C{None} if the game was over.
+    @rtype: C{int} or C{None}
+    """
+    for i, (old, new) in enumerate(zip(board_string, new_board_string)):
+        if old != new:
+            return i
+    return None
+
+def position_move_index(position, new_position):
+    """
+    The L{BitBoard} counterpart of L{move_index}.
+
+    @param position: the board.
+    @type position: L{BitBoard}
 
+    @param new_position: the result of L{find_position} for the board.
+    @type new_position: L{BitBoard}
+
+    @return: the index of the cell played, or C{None} if the game was over.
+    @rtype: C{int} or C{None}
+    """
+    played = ((new_position.x_bits | new_position.o_bits)
+        ^ (position.x_bits | position.o_bits))
+    return played.bit_length() - 1 if played else None
+
+def search_later(func, *args):
+    """
+    Call a function on the search thread pool.
+
+    @param func: the function to call.
+    @type func: C{function}
+
+    @return: a C{Deferred} firing on the reactor thread with the result.
+    @rtype: C{Deferred}
+    """
+    return deferToThreadPool(reactor, search_pool, func, *args)
+
+def ponder_later(func, *args):
+    """
+    Call a function on the pondering thread pool.
+
+    @param func: the function to call.
+    @type func: C{function}
+
+    @return: a C{Deferred} firing on the reactor thread with the result.
+    @rtype: C{Deferred}
+    """
+    return deferToThreadPool(reactor, ponder_pool, func, *args)
+
+def respond_later(request, deferred):
+    """
+    Respond to a request with the result of a C{Deferred}.
+
+    @param request: the request to respond to.
+    @type request: C{twisted.web.server.Request}
+
+    @param deferred: fires with the response body.
+    @type deferred: C{Deferred}
+
+    @return: C{NOT_DONE_YET}, to be returned from the render method.
+    """
+    # Set if the client disconnects before the search completes.
+    lost = []
+    request.notifyFinish().addErrback(lost.append)
+
+    def respond(body):
+        if not lost:
+            request.write(body)
+            request.finish()
+
+    def fail(failure):
+        logger.err('Search failed: {error}', error=failure.getErrorMessage())
+        if not lost:
+            request.setResponseCode(500)
+            request.finish()
+
+    deferred.addCallbacks(respond, fail)
+    return NOT_DONE_YET
 
 class GetMove(Resource):
+    """
+    Answers a single board.
+
+    Response bodies are kept in response_cache, keyed by the board query
+    value.  Responses carry an C{ETag} and a C{Cache-Control} header allowing
+    config.http_max_age seconds of caching; a request whose C{If-None-Match}
+    holds the current tag gets an empty 304 response.
+    """
     isLeaf = True
 
     def render_GET(self, request):
-        # construct a Board from the requests query parameter
-        old_board = board.from_string(request.args['board'][0])
-        # return the best move
-        return board.to_string(alpha_beta(old_board)[0][1])
+        # return the best move for the board in the requests query parameter
+        board_string = request.args['board'][0]
+        metrics.track(request, reactor.seconds)
+        metrics.count('move', int(len(board_string) ** 0.5))
+        body = response_cache.get(board_string)
+        if body is not None:
+            return self.respond(body, request)
+
+        body = cheap_move(board_string)
+        if body is not None:
+            return self.cache(body, board_string, request)
+        return respond_later(request, search_later(find_move, board_string)
+            .addCallback(self.cache, board_string, request))
+
+    def cache(self, body, board_string, request):
+        """
+        Add a response body to the response cache and respond with it.
+        """
+        response_cache.put(board_string, body)
+        return self.respond(body, request)
+
+    def respond(self, body, request):
+        """
+        Set the caching headers of a response.
+
+        @return: the body to write, empty if the client's copy is current.
+        @rtype: C{str}
+        """
+        etag = '"{0}"'.format(md5(body).hexdigest())
+        request.setHeader('etag', etag)
+        request.setHeader('cache-control',
+            'public, max-age={0}'.format(config.http_max_age))
+
+        tags = [tag.strip()
+            for tag in (request.getHeader('if-none-match') or '').split(',')]
+        if etag in tags or '*' in tags:
+            request.setResponseCode(NOT_MODIFIED)
+            return ''
+        return body
+
+class BatchMove(Resource):
+    """
+    Answers many boards in one request.
+
+    The body of a POST holds the board strings either one per line or, if the
+    Content-Type is application/json, as a JSON list.  The response holds the
+    result of L{find_move} for each board in the same format and order.  A
+    JSON body that is not a list of strings gets an empty 400 response.
+    """
+    isLeaf = True
+
+    def render_POST(self, request):
+        body = request.content.read()
+        is_json = (request.getHeader('content-type') or '').startswith(
+            'application/json')
+        if is_json:
+            try:
+                board_strings = json.loads(body)
+                if not isinstance(board_strings, list) or not all(
+                        [isinstance(board_string, basestring)
+                        for board_string in board_strings]):
+                    raise TypeError('Expected a list of board strings')
+                board_strings = [str(board_string)
+                    for board_string in board_strings]
+            except (TypeError, ValueError) as error:
+                logger.err('Bad batch request: {error}', error=error)
+                request.setResponseCode(BAD_REQUEST)
+                return ''
+            request.setHeader('content-type', 'application/json')
+            render = json.dumps
+        else:
+            board_strings = [line for line in body.splitlines() if line]
+            request.setHeader('content-type', 'text/plain')
+            def render(moves):
+                return ''.join([move + '\n' for move in moves])
+
+        metrics.track(request, reactor.seconds)
+        for board_string in board_strings:
+            metrics.count('batch', int(len(board_string) ** 0.5))
+
+        moves = [cheap_move(board_string) for board_string in board_strings]
+        if None not in moves:
+            return render(moves)
+        return respond_later(request,
+            search_later(lambda: render(find_moves(board_strings))))
+
+class PackedMove(Resource):
+    """
+    Answers boards in the compact binary format of L{common.wire}.
+
+    The body of a POST holds one or more packed boards; the response holds
+    the packed index of the cell the server plays on each, in order.  A body
+    that is not a sequence of valid boards gets an empty 400 response.
+    """
+    isLeaf = True
+
+    def render_POST(self, request):
+        try:
+            positions = wire.unpack_all(request.content.read())
+        except ValueError as error:
+            logger.warn('Bad packed request: {error}', error=error)
+            request.setResponseCode(BAD_REQUEST)
+            return ''
+        request.setHeader('content-type', 'application/octet-stream')
+
+        metrics.track(request, reactor.seconds)
+        for position in positions:
+            metrics.count('packed', position.side_len())
+
+        def render(moves):
+            return wire.pack_moves([position_move_index(position, move)
+                for position, move in zip(positions, moves)])
+
+        moves = [cheap_position(position) for position in positions]
+        if None not in moves:
+            return render(moves)
+        return respond_later(request,
+            search_later(lambda: render(find_positions(positions))))
+
+class MetricsResource(Resource):
+    """
+    Reports the servers L{Metrics} in the Prometheus text format.
+    """
+    isLeaf = True
+
+    def render_GET(self, request):
+        request.setHeader('content-type', 'text/plain; version=0.0.4')
+        return metrics.render()
+
+def root():
+    """
+    Build the servers resource tree.
+
+    @return: the root resource.
+    @rtype: C{Resource}
+    """
+    root = Resource()
+    root.putChild('', GetMove())
+    root.putChild('batch', BatchMove())
+    root.putChild('packed', PackedMove())
+    root.putChild('metrics', MetricsResource())
+    return root
 
 if __name__ == '__main__':
-    reactor.listenTCP(config.port, Site(GetMove()))
+    log_sink = buffer_log(config.log_buffer_size, config.log_flush_interval)
+    reactor.addSystemEventTrigger('after', 'shutdown', unbuffer_log, log_sink)
+    if config.search_workers > 1:
+        parallel_search = ParallelSearch(config.search_workers)
+    search_pool.start()
+    reactor.addSystemEventTrigger('before', 'shutdown', search_pool.stop)
+    reactor.listenTCP(config.port, Site(root()))
+    if config.session_port:
+        ponder_pool.start()
+        reactor.addSystemEventTrigger('before', 'shutdown', ponder_pool.stop)
+        reactor.listenTCP(config.session_port,
+            SessionFactory(search_later, ponder_later))
     reactor.run()
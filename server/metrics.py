@@ -0,0 +1,212 @@
+"""
+Server metrics in the Prometheus text exposition format.
+
+Recording a figure is a counter increment or an append to a bounded window of
+samples, so the metrics are always on.  Quantiles are only calculated when the
+metrics are rendered, over the most recent samples.
+"""
+
+from collections import deque
+from math import ceil
+from threading import Lock
+
+# The quantiles rendered for every L{Summary}.
+QUANTILES = (0.5, 0.95, 0.99)
+
+# The number of recent samples L{Summary} quantiles are calculated over.
+WINDOW = 2 ** 12
+
+def format_labels(labels):
+    """
+    Format the labels of a sample.
+
+    @param labels: the label names and values, in order.
+    @type labels: C{tuple} of C{tuple} of C{str}
+
+    @return: the labels in braces, or an empty string if there are none.
+    @rtype: C{str}
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join(['{0}="{1}"'.format(name, value)
+        for name, value in labels]) + '}'
+
+class Summary(object):
+    """
+    Observations of a quantity: their count and sum, and the quantiles of
+    the most recent ones.
+
+    Observations may be recorded from any thread.
+
+    @ivar count: the number of observations.
+    @type count: C{int}
+
+    @ivar total: the sum of the observations.
+    @type total: C{float}
+
+    @ivar samples: the most recent observations.
+    @type samples: C{deque}
+    """
+
+    def __init__(self, window=WINDOW):
+        """
+        Construct an empty L{Summary}.
+
+        @param window: the number of observations quantiles are calculated
+            over.
+        @type window: C{int}
+        """
+        self.count = 0
+        self.total = 0
+        self.samples = deque(maxlen=window)
+        self.lock = Lock()
+
+    def observe(self, value):
+        """
+        Record an observation.
+
+        @param value: the observed value.
+        @type value: C{int} or C{float}
+        """
+        with self.lock:
+            self.count += 1
+            self.total += value
+            self.samples.append(value)
+
+    def quantile(self, q):
+        """
+        Return a quantile of the recent observations.
+
+        @param q: the quantile, between 0 and 1.
+        @type q: C{float}
+
+        @return: the nearest-rank quantile: the smallest recent observation
+            that is at least as large as the fraction q of them, or C{None} if
+            there are none.
+        """
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        rank = int(ceil(q * len(samples))) - 1
+        return samples[max(0, min(len(samples) - 1, rank))]
+
+class Metrics(object):
+    """
+    The figures reported by the servers /metrics resource.
+
+    @ivar requests: the number of boards requested, keyed by the endpoint and
+        the board side length.
+    @type requests: C{dict}
+
+    @ivar in_flight: the number of requests being answered.
+    @type in_flight: C{int}
+
+    @ivar latency: the time in seconds from receiving a request to finishing
+        the response.
+    @type latency: L{Summary}
+
+    @ivar nodes: the number of positions searched for each searched board.
+    @type nodes: L{Summary}
+
+    @ivar gauges: the name, help text and value function of figures read when
+        the metrics are rendered.
+    @type gauges: C{list} of C{tuple}
+    """
+
+    def __init__(self):
+        """
+        Construct empty L{Metrics}.
+        """
+        self.requests = {}
+        self.in_flight = 0
+        self.latency = Summary()
+        self.nodes = Summary()
+        self.gauges = []
+
+    def count(self, endpoint, side_len):
+        """
+        Count a requested board.  Must be called on the reactor thread.
+
+        @param endpoint: the name of the resource.
+        @type endpoint: C{str}
+
+        @param side_len: the side length of the board.
+        @type side_len: C{int}
+        """
+        key = endpoint, side_len
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+    def track(self, request, clock):
+        """
+        Count a request as in flight until its response is finished, then
+        record its latency.  Must be called on the reactor thread.
+
+        @param request: the request.
+        @type request: C{twisted.web.server.Request}
+
+        @param clock: returns the current time in seconds.
+        @type clock: C{function}
+        """
+        start = clock()
+        self.in_flight += 1
+
+        def finished(result):
+            self.in_flight -= 1
+            self.latency.observe(clock() - start)
+
+        request.notifyFinish().addBoth(finished)
+
+    def gauge(self, name, text, value):
+        """
+        Add a figure read when the metrics are rendered.
+
+        @param name: the metric name.
+        @type name: C{str}
+
+        @param text: the help text.
+        @type text: C{str}
+
+        @param value: returns the current value.
+        @type value: C{function}
+        """
+        self.gauges.append((name, text, value))
+
+    def render(self):
+        """
+        Render the metrics in the Prometheus text format.
+
+        @rtype: C{str}
+        """
+        lines = []
+
+        def metric(name, kind, text, samples):
+            lines.append('# HELP {0} {1}'.format(name, text))
+            lines.append('# TYPE {0} {1}'.format(name, kind))
+            for suffix, labels, value in samples:
+                if value is None:
+                    value = 'NaN'
+                lines.append('{0}{1}{2} {3}'.format(
+                    name, suffix, format_labels(labels), value))
+
+        def summary(name, text, observed):
+            metric(name, 'summary', text,
+                [('', (('quantile', q),), observed.quantile(q))
+                    for q in QUANTILES] +
+                [('_sum', (), observed.total), ('_count', (), observed.count)])
+
+        metric('ttt_requests_total', 'counter',
+            'Boards requested by endpoint and side length.',
+            [('', (('endpoint', endpoint), ('side_len', side_len)), count)
+                for (endpoint, side_len), count
+                in sorted(self.requests.items())])
+        metric('ttt_requests_in_flight', 'gauge',
+            'Requests being answered.', [('', (), self.in_flight)])
+        summary('ttt_request_latency_seconds',
+            'Time from receiving a request to finishing its response.',
+            self.latency)
+        summary('ttt_search_nodes',
+            'Positions searched per searched board.', self.nodes)
+        for name, text, value in self.gauges:
+            metric(name, 'gauge', text, [('', (), value())])
+        return '\n'.join(lines) + '\n'
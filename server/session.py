@@ -0,0 +1,357 @@
+"""
+Session mode: whole games played over one persistent connection.
+
+The stateless server is sent the entire board with every move and forgets
+everything it learned once it has answered.  A session instead keeps the
+position of its game and a transposition table of its own for as long as the
+connection stays open, so the client only sends the index of the cell it
+plays, and each search of the server starts from the positions the previous
+searches already scored.
+
+The protocol is line based, one command per line:
+
+    new <side_len>  start a game on a blank board; answered with 'ok'.
+    play <index>    play a cell for the client, then have the server move.
+    go              have the server move, e.g. to take the first turn.
+
+'play' and 'go' are answered with 'move <index>', the cell the server played,
+or 'over' if the game was already over.  A command that cannot be carried out
+is answered with 'error <reason>' and leaves the game unchanged.
+
+While the client thinks about its move the server ponders: it searches its
+reply to each of the clients likely moves in turn, the most promising first,
+and keeps the results.  A client move that was pondered is answered at once.
+Pondering stops as soon as the client moves or disconnects, and after
+config.ponder_budget_ms milliseconds per turn at the most; a session stops
+pondering for good once it has spent config.ponder_session_budget_ms in all.
+These budgets are measured by the wall clock while a pondering thread works
+for the session, Python 2 having no per-thread CPU clock.  Pondering runs on
+its own threads, see L{server.main.ponder_later}, so idle sessions pondering
+never hold up the searches of the clients waiting for a move.
+"""
+
+from threading import Event
+from threading import Lock
+from time import time
+
+from twisted.internet.protocol import Factory
+from twisted.protocols.basic import LineReceiver
+
+from common import config
+from common.log import Loggable
+from common.model import bitboard
+from server.ai.minimax import SMALL_BOARD_CUTOFF
+from server.ai.minimax import best_move
+from server.ai.minimax import iterative_deepening
+from server.ai.ordering import MoveOrderer
+from server.ai.transposition import TranspositionTable
+from server.ai.transposition import capacity_for
+
+# The largest side length a session plays on.
+MAX_SIDE_LEN = 15
+
+class SessionError(Exception):
+    """
+    Raised for a session command that cannot be carried out.
+    """
+    pass
+
+class Session(object):
+    """
+    The game of one session connection.
+
+    @ivar position: the current position.
+    @type position: L{BitBoard}
+
+    @ivar table: the transposition table kept between the servers searches.
+    @type table: L{TranspositionTable}
+
+    @ivar pondered: the servers reply to each client move pondered since the
+        servers last move.
+    @type pondered: C{dict} of C{int}
+
+    @ivar pondered_seconds: the time spent pondering so far.
+    @type pondered_seconds: C{float}
+
+    @ivar lock: held by the thread using the table, so that searching and
+        pondering take turns with it.
+    @type lock: C{threading.Lock}
+    """
+
+    def __init__(self, side_len):
+        """
+        Start a game on a blank board.
+
+        @param side_len: the side length of the board.
+        @type side_len: C{int}
+        """
+        self.position = bitboard.blank(side_len)
+        self.table = TranspositionTable(
+            capacity_for(config.session_tt_bytes), config.tt_policy)
+        self.pondered = {}
+        self.pondered_seconds = 0.0
+        self.lock = Lock()
+
+    def play(self, index):
+        """
+        Play a cell for the client.
+
+        @param index: the cell.
+        @type index: C{int}
+
+        @raise SessionError: if the game is over or the cell is not blank.
+        """
+        if self.position.is_leaf_and_score()[0]:
+            raise SessionError('game over')
+        if index not in self.position.empty_cells():
+            raise SessionError('invalid move {0}'.format(index))
+        self.position.play(index)
+
+    def pondered_reply(self):
+        """
+        Play the servers pondered reply to the clients last move, if there is
+        one.
+
+        @return: the cell played, or C{None} if the move was not pondered.
+        @rtype: C{int} or C{None}
+        """
+        move = self.pondered.get(self.position.last)
+        if move is not None:
+            self.position.play(move)
+        return move
+
+    def reply(self):
+        """
+        Search for the servers move and play it.  Blocks for the length of
+        the search, and first for a pondering that is still winding down.
+
+        @return: the cell played, or C{None} if the game is over.
+        @rtype: C{int} or C{None}
+        """
+        position = self.position
+        if position.is_leaf_and_score()[0]:
+            return None
+        taken = position.x_bits | position.o_bits
+        with self.lock:
+            after = best_move(position, table=self.table)
+        move = ((after.x_bits | after.o_bits) ^ taken).bit_length() - 1
+        position.play(move)
+        return move
+
+    def ponder(self, position, cancelled, pondered):
+        """
+        Search the servers reply to the clients likely moves, until
+        config.ponder_budget_ms or what is left of
+        config.ponder_session_budget_ms is spent, or pondering is cancelled.
+        Blocks for the length of the searches.
+
+        Each reply is searched as L{reply} would, for config.search_budget_ms,
+        so a pondered reply is as good as a searched one.  3x3 boards are not
+        pondered, their searches are immediate.
+
+        @param position: a copy of the position, the client to move.
+        @type position: L{BitBoard}
+
+        @param cancelled: stops pondering once set.
+        @type cancelled: C{threading.Event}
+
+        @param pondered: the replies are added to it, keyed by the client move.
+            A new C{dict} for each turn, so that a cancelled pondering winding
+            down cannot add stale replies to that of the next turn.
+        @type pondered: C{dict}
+        """
+        side_len = position.side_len()
+        if (side_len <= SMALL_BOARD_CUTOFF
+                or position.is_leaf_and_score()[0]):
+            return
+        with self.lock:
+            # Taken here rather than when the pondering was queued, so that
+            # a search never waits on a pondering that was cancelled before
+            # it started.
+            if cancelled.is_set():
+                return
+            start = time()
+            try:
+                self.ponder_moves(position, cancelled, pondered, start)
+            finally:
+                self.pondered_seconds += time() - start
+
+    def ponder_moves(self, position, cancelled, pondered, start):
+        """
+        Search the replies for L{ponder}, which holds the lock.
+
+        @param start: the time pondering started.
+        @type start: C{float}
+        """
+        side_len = position.side_len()
+        left = min(config.ponder_budget_ms,
+            config.ponder_session_budget_ms - self.pondered_seconds * 1000)
+        deadline = start + left / 1000.0
+        budget = config.search_budget_ms / 1000.0
+        if position.x_has_next_turn():
+            own_bits, other_bits = position.x_bits, position.o_bits
+        else:
+            own_bits, other_bits = position.o_bits, position.x_bits
+        moves = MoveOrderer(side_len).order(
+            own_bits, other_bits, position.empty_cells(), 0)
+        for move in moves:
+            if cancelled.is_set() or time() + budget > deadline:
+                return
+            position.play(move)
+            if not position.is_leaf_and_score()[0]:
+                score, reply, plies = iterative_deepening(position,
+                    config.search_budget_ms, self.table, cancelled=cancelled)
+                # The result of a cancelled search may be shallower.
+                if not cancelled.is_set():
+                    pondered[move] = reply
+            position.undo(move)
+
+class SessionProtocol(LineReceiver, Loggable):
+    """
+    Plays the games of one session connection, see the module docstring.
+
+    Commands received while the server is searching for its move are
+    refused.  Searching and pondering take turns holding the lock of the
+    L{Session}, so the sessions table is only ever used by one thread at a
+    time.
+    """
+    delimiter = '\n'
+
+    def __init__(self, search, ponder=None):
+        """
+        Construct a L{SessionProtocol}.
+
+        @param search: calls a function away from the reactor thread, as
+            L{server.main.search_later} does.
+        @type search: C{function}
+
+        @param ponder: calls a function on the pondering threads, as
+            L{server.main.ponder_later} does, or C{None} not to ponder.
+        @type ponder: C{function}
+        """
+        self.search = search
+        self.ponder = ponder
+        self.session = None
+        self.searching = False
+        # Set to stop the current pondering.
+        self.cancelled = None
+
+    def lineReceived(self, line):
+        words = line.split()
+        command = getattr(self, 'command_' + (words[0] if words else ''),
+            None)
+        try:
+            if command is None:
+                raise SessionError('unknown command')
+            if self.searching:
+                raise SessionError('busy')
+            command(*words[1:])
+        except (SessionError, TypeError, ValueError) as error:
+            self.sendLine('error {0}'.format(error))
+
+    def connectionLost(self, reason):
+        self.stop_pondering()
+        # A search still running finds the game gone, see send_move.
+        self.session = None
+
+    def command_new(self, side_len):
+        side_len = int(side_len)
+        if not 0 < side_len <= MAX_SIDE_LEN:
+            raise SessionError('invalid side length {0}'.format(side_len))
+        self.stop_pondering()
+        self.session = Session(side_len)
+        self.sendLine('ok')
+
+    def command_play(self, index):
+        session = self.started()
+        session.play(int(index))
+        self.stop_pondering()
+        move = session.pondered_reply()
+        if move is None:
+            self.reply()
+        else:
+            self.send_move(move)
+
+    def command_go(self):
+        self.started()
+        self.stop_pondering()
+        self.reply()
+
+    def started(self):
+        """
+        Return the session of the game in progress.
+
+        @raise SessionError: if no game was started.
+        """
+        if self.session is None:
+            raise SessionError('no game')
+        return self.session
+
+    def send_move(self, move):
+        """
+        Send the servers move, then start pondering the clients reply.  Does
+        nothing if the client disconnected during the search.
+
+        @param move: the cell played, or C{None} if the game is over.
+        @type move: C{int} or C{None}
+        """
+        if self.session is None:
+            return
+        self.sendLine('over' if move is None else 'move {0}'.format(move))
+        if move is not None and self.ponder is not None \
+                and config.ponder_budget_ms > 0:
+            session = self.session
+            session.pondered = {}
+            self.cancelled = Event()
+            self.ponder(session.ponder, session.position.copy(),
+                self.cancelled, session.pondered)\
+                .addErrback(lambda failure: self.err(
+                    'Pondering failed: {error}',
+                    error=failure.getErrorMessage()))
+
+    def stop_pondering(self):
+        """
+        Cancel the current pondering, if any.
+        """
+        if self.cancelled is not None:
+            self.cancelled.set()
+            self.cancelled = None
+
+    def reply(self):
+        """
+        Search for the servers move and send it once found.
+        """
+        def fail(failure):
+            self.err('Search failed: {error}', error=failure.getErrorMessage())
+            if self.session is not None:
+                self.sendLine('error search failed')
+
+        def done(result):
+            self.searching = False
+
+        self.searching = True
+        self.search(self.session.reply)\
+            .addCallbacks(self.send_move, fail).addBoth(done)
+
+class SessionFactory(Factory):
+    """
+    Builds a L{SessionProtocol} for each session connection.
+    """
+
+    def __init__(self, search, ponder=None):
+        """
+        Construct a L{SessionFactory}.
+
+        @param search: see L{SessionProtocol}.
+        @type search: C{function}
+
+        @param ponder: see L{SessionProtocol}.
+        @type ponder: C{function}
+        """
+        self.search = search
+        self.ponder = ponder
+
+    def buildProtocol(self, addr):
+        protocol = SessionProtocol(self.search, self.ponder)
+        protocol.factory = self
+        return protocol
@@ -0,0 +1,40 @@
+from bench.suite import compare
+from bench.suite import positions
+from common.model.bitboard import from_string
+
+from test_board import board_string_list
+
+def test_positions():
+    for side_len in range(3, 9):
+        strings = positions(side_len)
+        assert strings == positions(side_len)
+        assert all([len(string) == side_len ** 2 for string in strings])
+    assert set(positions(3) + positions(4)) >= set(board_string_list)
+    assert not any([from_string(string).is_win()
+        for string in positions(5)])
+
+def test_compare():
+    baseline = {'a/3': {'seconds': 1.0}, 'b/3': {'seconds': 1.0}}
+    results = {
+        'a/3': {'seconds': 1.05},
+        'b/3': {'seconds': 1.5},
+        'c/3': {'seconds': 9.0}}
+    assert compare(results, baseline) == [('b/3', 'seconds', 1.5)]
+    assert compare(results, baseline, 0.01) ==\
+        [('b/3', 'seconds', 1.5), ('a/3', 'seconds', 1.05)]
+
+def test_compare_memory():
+    baseline = {
+        'a/3': {'seconds': 1.0, 'retained_objects': 1000,
+            'peak_bytes': 10 ** 6},
+        'b/3': {'seconds': 1.0, 'retained_objects': 10, 'peak_bytes': 0},
+        'c/3': {'seconds': 1.0, 'retained_objects': 10, 'peak_bytes': None}}
+    results = {
+        'a/3': {'seconds': 1.0, 'retained_objects': 2000,
+            'peak_bytes': 2 * 10 ** 6},
+        # Increases below the minimum are noise.
+        'b/3': {'seconds': 1.0, 'retained_objects': 60, 'peak_bytes': 4096},
+        'c/3': {'seconds': 1.0, 'retained_objects': 10,
+            'peak_bytes': 10 ** 7}}
+    assert compare(results, baseline) ==\
+        [('a/3', 'retained_objects', 2.0), ('a/3', 'peak_bytes', 2.0)]
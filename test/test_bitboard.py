@@ -0,0 +1,144 @@
+from random import Random
+
+from common import config
+from common.model import board
+from common.model.bitboard import blank
+from common.model.bitboard import from_string
+from common.model.bitboard import to_string
+from common.model.bitboard import symmetry_tables
+from common.model.bitboard import transform_bits
+
+from test_board import board_string_list
+from test_board import x_has_next_turn_results
+from test_board import is_leaf_and_score_results
+from test_board import is_draw_results
+
+def test_blank():
+    for side_len in range(1, 8):
+        assert to_string(blank(side_len)) == ' ' * side_len ** 2
+
+def test_to_from_string():
+    assert all([board_string == to_string(from_string(board_string))
+        for board_string in board_string_list])
+
+def test_to_string_accepts_board():
+    assert all([board_string == to_string(board.from_string(board_string))
+        for board_string in board_string_list])
+
+def test_is_win_at():
+    assert from_string('OOX X XOO').is_win_at(4)
+    assert not from_string('OOX X XOO').is_win_at(0)
+    assert from_string('XXX   OO ').is_win_at(1)
+    assert not from_string('XXX   OO ').is_win_at(6)
+
+def test_is_win_last_move():
+    child = [child for child in from_string('XX  OO   ').children()
+        if child.last == 2][0]
+    assert child.is_win()
+    child = [child for child in from_string('XX  OO   ').children()
+        if child.last == 3][0]
+    assert not child.is_win()
+
+def test_side_len():
+    assert [3, 3, 4, 4, 3, 3, 3] == [from_string(board_string).side_len()
+        for board_string in board_string_list]
+
+def test_x_has_next_turn():
+    assert all([result == from_string(board_string).x_has_next_turn()
+        for board_string, result in zip(board_string_list, x_has_next_turn_results)])
+
+def test_children():
+    assert all([
+        sorted([to_string(child) for child in from_string(board_string).children()]) ==
+        sorted([board.to_string(child)
+            for child in board.from_string(board_string).children()])
+        for board_string in board_string_list])
+
+def test_is_leaf_and_score():
+    assert all([result == from_string(board_string).is_leaf_and_score()
+        for board_string, result in zip(
+            board_string_list, is_leaf_and_score_results)])
+
+def test_is_draw():
+    assert all([result == from_string(board_string).is_draw()
+        for board_string, result in zip(
+            board_string_list, is_draw_results)])
+
+def test_lines():
+    assert all([
+        from_string(board_string).all_lines() ==
+        board.from_string(board_string).all_lines()
+        for board_string in board_string_list])
+
+def test_heur_score():
+    assert all([
+        from_string(board_string).heur_score() ==
+        board.from_string(board_string).heur_score()
+        for board_string in board_string_list])
+
+def test_transform_bits():
+    for board_string in board_string_list:
+        bit_board = from_string(board_string)
+        side_len = bit_board.side_len()
+        for perm, chunks in zip(board.transforms(side_len),
+                symmetry_tables(side_len)):
+            transformed = from_string(
+                board.transform_string(board_string, perm))
+            assert transform_bits(bit_board.x_bits, chunks) == transformed.x_bits
+            assert transform_bits(bit_board.o_bits, chunks) == transformed.o_bits
+
+def test_canonical():
+    corners = ['X        ', '  X      ', '      X  ', '        X']
+    assert len(set([from_string(board_string).canonical()[:2]
+        for board_string in corners])) == 1
+
+def test_distinct_moves():
+    assert from_string('         ').distinct_moves() == [0, 1, 4]
+    assert from_string(' ' * 16).distinct_moves() == [0, 1, 5]
+    assert from_string('    X    ').distinct_moves() == [0, 1]
+    assert from_string('X        ').distinct_moves() == [1, 2, 4, 5, 8]
+
+def test_k_in_a_row(monkeypatch):
+    monkeypatch.setattr(config, 'win_length', 3)
+    assert from_string('X    '
+                       ' X   '
+                       '  X  '
+                       'OO   '
+                       '    O').is_win()
+    assert from_string('    X'
+                       '   X '
+                       '  XO '
+                       ' O   '
+                       'O    ').is_win_at(12)
+    assert not from_string('XX X '
+                           'OO O '
+                           '     '
+                           '     '
+                           '     ').is_win()
+    assert from_string('     '
+                       '   X '
+                       '  X  '
+                       ' X   '
+                       'OO   ').heur_score() == 0.5
+
+def longest_run(position, index):
+    side_len = position.side_len()
+    symbol = to_string(position)[index]
+    row, col = divmod(index, side_len)
+    def run(row_step, col_step):
+        r, c, count = row + row_step, col + col_step, 0
+        while 0 <= r < side_len and 0 <= c < side_len and \
+                to_string(position)[r * side_len + c] == symbol:
+            r, c, count = r + row_step, c + col_step, count + 1
+        return count
+    return max([1 + run(dr, dc) + run(-dr, -dc)
+        for dr, dc in [(0, 1), (1, 0), (1, 1), (-1, 1)]])
+
+def test_is_win_at_counts_runs(monkeypatch):
+    monkeypatch.setattr(config, 'win_length', 4)
+    random = Random(0)
+    for _ in range(200):
+        position = blank(6)
+        for i in random.sample(range(36), random.randint(1, 20)):
+            position.play(i)
+        assert position.is_win_at(i) == (longest_run(position, i) >= 4)
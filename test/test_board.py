@@ -4,6 +4,10 @@ from common.model.board import blank, to_string, check_line
 from common.model.board import from_string
 from common.model.board import Board
 from common.model.board import Cell
+from common.model.board import canonical
+from common.model.board import inverse
+from common.model.board import transform_string
+from common.model.board import transforms
 
 board_string_list  = [
     'OOX X XOO',
@@ -266,3 +270,22 @@ def test_zag_line():
     assert 'O X' == from_string(board_string_list[4]).zag_line()[0]
     assert ' OX' == from_string(board_string_list[5]).zag_line()[0]
     assert '   ' == from_string(board_string_list[6]).zag_line()[0]
+
+def test_transforms():
+    perms = transforms(3)
+    assert len(set(perms)) == 8
+    assert perms[0] == tuple(range(9))
+    assert transform_string('XO       ', perms[1]) == '  X  O   '
+    assert all([transform_string(transform_string(board_string, perm),
+            inverse(perm)) == board_string
+        for board_string in board_string_list
+        for perm in transforms(int(sqrt(len(board_string))))])
+
+def test_canonical():
+    corners = ['X        ', '  X      ', '      X  ', '        X']
+    assert len(set([canonical(board_string)[0] for board_string in corners])) == 1
+    assert canonical('X        ')[0] != canonical(' X       ')[0]
+    for board_string in board_string_list:
+        string, t = canonical(board_string)
+        side_len = int(sqrt(len(board_string)))
+        assert transform_string(board_string, transforms(side_len)[t]) == string
@@ -0,0 +1,39 @@
+import sys
+
+from server.cache import LRUCache
+
+def test_get_put():
+    cache = LRUCache(2)
+    assert cache.get('a') is None
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate() == 0.5
+
+def test_eviction():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.evictions == 1
+    cache.put('c', 4)
+    assert cache.evictions == 1
+    assert cache.get('c') == 4
+
+def test_hit_rate_empty():
+    assert LRUCache(1).hit_rate() == 0.0
+
+def test_memory():
+    cache = LRUCache(2)
+    empty = cache.memory()
+    cache.put('a', 'x' * 100)
+    assert cache.memory() >= empty + 100
+    cache.put('a', 'x')
+    cache.put('b', 'x')
+    cache.put('c', 'x')
+    assert cache.size == 2 * (sys.getsizeof('a') + sys.getsizeof('x'))
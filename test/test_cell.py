@@ -1,6 +1,8 @@
 from pytest import raises
 
+from common.model import board
 from common.model.cell import Cell
+from common.model.cell import CellBase
 from common.model.cell import InvalidMove
 
 
@@ -17,3 +19,12 @@ def test_set_state():
     cell.set_state('X')
     with raises(InvalidMove):
         cell.set_state('X')
+
+def test_slots():
+    assert not hasattr(Cell(0, ' '), '__dict__')
+    assert not hasattr(CellBase(0, ' '), '__dict__')
+
+def test_engine_cells():
+    assert type(board.from_string('X        ').state[0]) is Cell
+    for child in board.from_string('X        ').children():
+        assert all([type(cell) is CellBase for cell in child.state])
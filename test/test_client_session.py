@@ -0,0 +1,56 @@
+from twisted.internet import reactor
+from twisted.internet.testing import StringTransport
+from twisted.python.failure import Failure
+
+from client.controller import session
+from common.model import board
+
+def connect():
+    client = session.SessionClientFactory().buildProtocol(None)
+    transport = StringTransport()
+    client.makeConnection(transport)
+    return client, transport
+
+def test_get_move():
+    client, transport = connect()
+    boards = []
+    assert client.get_move('X        ', boards.append, None)
+    assert transport.value() == 'new 3\nplay 0\n'
+    client.dataReceived('ok\nmove 4\n')
+    assert boards == ['X   O    ']
+    client.connectionLost(None)
+
+def test_error_falls_back():
+    client, transport = connect()
+    fallbacks = []
+    client.get_move('X        ', None, lambda: fallbacks.append(True))
+    client.dataReceived('ok\nerror busy\n')
+    assert fallbacks == [True]
+    assert client.board_string is None
+    client.connectionLost(None)
+
+def test_connection_lost_falls_back():
+    client, transport = connect()
+    fallbacks = []
+    client.get_move('X        ', None, lambda: fallbacks.append(True))
+    client.connectionLost(None)
+    assert fallbacks == [True]
+    assert session._client is None
+
+def test_connects_once(monkeypatch):
+    connections = []
+    monkeypatch.setattr(reactor, 'connectTCP',
+        lambda host, port, factory: connections.append(factory))
+    fallbacks = []
+    old_board = board.blank(3)
+    session.get_move(old_board, None, lambda: fallbacks.append(True))
+    session.get_move(old_board, None, lambda: fallbacks.append(True))
+    assert len(connections) == 1
+    assert fallbacks == [True, True]
+    # A failed attempt lets the next move try again.
+    connections[0].clientConnectionFailed(None,
+        Failure(Exception('refused')))
+    session.get_move(old_board, None, lambda: fallbacks.append(True))
+    assert len(connections) == 2
+    connections[1].clientConnectionFailed(None,
+        Failure(Exception('refused')))
@@ -0,0 +1,129 @@
+import sys
+from threading import Event
+from types import ModuleType
+
+# The engine hands its results to the Kivy main loop; without Kivy they are
+# handed over on the engine thread by this stand-in.
+if 'kivy.clock' not in sys.modules:
+    class Clock(object):
+        @staticmethod
+        def schedule_once(callback, timeout=0):
+            callback(0)
+    kivy = sys.modules.setdefault('kivy', ModuleType('kivy'))
+    kivy.clock = sys.modules['kivy.clock'] = ModuleType('kivy.clock')
+    kivy.clock.Clock = Clock
+
+from pytest import fixture
+
+from client.controller import engine
+from common import config
+
+INF = float('inf')
+
+@fixture(autouse=True)
+def fresh(monkeypatch):
+    monkeypatch.setattr(engine, 'latencies', engine.Latencies())
+    monkeypatch.setattr(engine, '_moves', {})
+    monkeypatch.setattr(config, 'engine', engine.AUTO)
+    monkeypatch.setattr(config, 'local_max_side_len', 4)
+    monkeypatch.setattr(engine, 'PROBE_INTERVAL', 1000)
+
+def test_latencies():
+    latencies = engine.Latencies()
+    assert latencies.get(engine.LOCAL, 3) is None
+    latencies.record(engine.LOCAL, 3, 1.0)
+    latencies.record(engine.LOCAL, 3, 2.0)
+    assert latencies.get(engine.LOCAL, 3) == 1.0 + engine.SMOOTHING
+    latencies.record(engine.LOCAL, 3, INF)
+    assert latencies.get(engine.LOCAL, 3) == INF
+    latencies.record(engine.LOCAL, 3, 0.5)
+    assert latencies.get(engine.LOCAL, 3) == 0.5
+    assert latencies.get(engine.REMOTE, 3) is None
+
+def test_failure_expires(monkeypatch):
+    times = [100.0]
+    monkeypatch.setattr(engine, 'time', lambda: times[0])
+    latencies = engine.Latencies()
+    latencies.record(engine.REMOTE, 5, INF)
+    times[0] += engine.FAILURE_EXPIRY
+    assert latencies.get(engine.REMOTE, 5) == INF
+    times[0] += 1
+    assert latencies.get(engine.REMOTE, 5) is None
+
+def test_choose_defaults():
+    assert engine.choose(3) == engine.LOCAL
+    assert engine.choose(4) == engine.LOCAL
+    assert engine.choose(5) == engine.REMOTE
+
+def test_choose_configured(monkeypatch):
+    monkeypatch.setattr(config, 'engine', engine.REMOTE)
+    assert engine.choose(3) == engine.REMOTE
+
+def test_choose_faster():
+    engine.latencies.record(engine.LOCAL, 5, 0.1)
+    assert engine.choose(5) == engine.REMOTE
+    engine.latencies.record(engine.REMOTE, 5, 0.3)
+    assert engine.choose(5) == engine.LOCAL
+    engine.latencies.record(engine.LOCAL, 3, 0.3)
+    engine.latencies.record(engine.REMOTE, 3, 0.1)
+    assert engine.choose(3) == engine.REMOTE
+
+def test_choose_after_failure():
+    engine.latencies.record(engine.REMOTE, 5, INF)
+    assert engine.choose(5) == engine.LOCAL
+    engine.latencies.record(engine.LOCAL, 3, INF)
+    assert engine.choose(3) == engine.REMOTE
+
+def test_choose_probes(monkeypatch):
+    monkeypatch.setattr(engine, 'PROBE_INTERVAL', 3)
+    assert [engine.choose(3) for i in range(6)] ==\
+        [engine.LOCAL, engine.LOCAL, engine.REMOTE] * 2
+    engine.latencies.record(engine.REMOTE, 5, INF)
+    assert [engine.choose(5) for i in range(3)] ==\
+        [engine.LOCAL, engine.LOCAL, engine.REMOTE]
+
+def get_local_move(board_string):
+    results = []
+    done = Event()
+    def finish(result):
+        results.append(result)
+        done.set()
+    engine.get_local_move(board_string, finish, finish)
+    assert done.wait(10)
+    return results[0]
+
+def test_local_move():
+    assert get_local_move('XX OO    ') == 'XXXOO    '
+    assert engine.latencies.get(engine.LOCAL, 3) < INF
+
+def test_local_failure(monkeypatch):
+    def fail(board):
+        raise MemoryError()
+    monkeypatch.setattr(engine, 'best_move', fail)
+    assert isinstance(get_local_move('XX OO    '), MemoryError)
+    assert engine.latencies.get(engine.LOCAL, 3) == INF
+    monkeypatch.undo()
+    # The engine thread keeps serving.
+    assert get_local_move('XX OO    ') == 'XXXOO    '
+
+def test_remote_callbacks():
+    boards = []
+    on_success, on_failure = engine.remote_callbacks('XX OO    ',
+        lambda req, result: boards.append(result), None)
+    on_success('request', 'XXXOO    ')
+    assert boards == ['XXXOO    ']
+    assert engine.latencies.get(engine.REMOTE, 3) < INF
+
+def test_remote_failure_falls_back():
+    done = Event()
+    boards = []
+    def on_board(req, result):
+        boards.append((req, result))
+        done.set()
+    on_success, on_failure = engine.remote_callbacks('XX OO    ',
+        on_board, None)
+    on_failure('request', 'refused')
+    assert done.wait(10)
+    assert boards == [('request', 'XXXOO    ')]
+    assert engine.latencies.get(engine.REMOTE, 3) == INF
+    assert engine.choose(3) == engine.LOCAL
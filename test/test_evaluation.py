@@ -0,0 +1,86 @@
+from random import Random
+
+from pytest import raises
+
+from common import config
+
+from common.model.bitboard import blank
+from common.model.bitboard import from_string
+from server.ai.evaluation import FILLED
+from server.ai.evaluation import FORK_SCORE
+from server.ai.evaluation import MATERIAL_SCORE
+from server.ai.evaluation import THREATS
+from server.ai.evaluation import THREAT_SCORE
+from server.ai.evaluation import ThreatEvaluator
+from server.ai.evaluation import evaluator
+from server.ai.evaluation import line_values
+from server.ai.minimax import Search
+
+def state(evaluation):
+    return (evaluation.x_counts, evaluation.o_counts, evaluation.material,
+        evaluation.x_threats, evaluation.o_threats)
+
+def test_evaluator():
+    board = blank(4)
+    assert isinstance(evaluator(board, THREATS), ThreatEvaluator)
+    assert evaluator(board, FILLED) is None
+    with raises(ValueError):
+        evaluator(board, 'random')
+
+def test_line_values():
+    values = line_values(3)
+    assert values[0][0] == 0
+    assert values[1][0] == 1
+    assert values[0][2] == -4
+    assert values[2][1] == 0
+
+def test_incremental():
+    random = Random(0)
+    for side_len in range(3, 7):
+        board = blank(side_len)
+        evaluation = ThreatEvaluator(board)
+        moves = random.sample(board.empty_cells(), board.size())
+        turns = []
+        for move in moves:
+            x_turn = board.x_has_next_turn()
+            board.play(move, x_turn)
+            evaluation.play(move, x_turn)
+            turns.append(x_turn)
+            assert state(evaluation) == state(ThreatEvaluator(board))
+        for move, x_turn in reversed(list(zip(moves, turns))):
+            board.undo(move)
+            evaluation.undo(move, x_turn)
+            assert state(evaluation) == state(ThreatEvaluator(board))
+
+def test_score():
+    # 'O' threatens to complete the first row.
+    board = from_string('OOO XX  X  X    ')
+    assert ThreatEvaluator(board).score(True) == -THREAT_SCORE
+    # 'X' threatens cell 3 and cell 12.
+    board = from_string('XXX XO OX    OO ')
+    assert ThreatEvaluator(board).score(True) == FORK_SCORE
+    # Both threats of 'X' are completed by cell 3.
+    board = from_string('XXX OO X   XOOOX')
+    assert abs(ThreatEvaluator(board).score(True)) < MATERIAL_SCORE
+    # The centre is worth more than an edge.
+    centre = ThreatEvaluator(from_string('    X    ')).score(True)
+    edge = ThreatEvaluator(from_string(' X       ')).score(True)
+    assert 0 < edge < centre
+    assert ThreatEvaluator(from_string('    X    ')).score(False) == -centre
+
+def test_search():
+    # 'X' forks by playing cell 0.
+    board = from_string(' XX XOO XO     O')
+    search = Search(board, 0, evaluator=ThreatEvaluator(board))
+    assert search.run() == (FORK_SCORE, 0)
+    assert state(search.evaluator) == state(ThreatEvaluator(board))
+
+def test_k_in_a_row(monkeypatch):
+    monkeypatch.setattr(config, 'win_length', 3)
+    # 'X' threatens cell 2, short of the end of the first row.
+    board = from_string('XX   O O        ')
+    evaluation = ThreatEvaluator(board)
+    assert evaluation.threat == 2
+    assert evaluation.score(False) == -THREAT_SCORE
+    search = Search(board, 0, evaluator=evaluation)
+    assert search.run() == (1.0, 2)
@@ -0,0 +1,58 @@
+from common import config
+from common.model.lines import line_index
+from common.model.lines import to_mask
+from common.model.lines import win_length
+
+def test_line_index_is_cached():
+    assert line_index(3) is line_index(3)
+
+def test_lines():
+    index = line_index(3)
+    assert len(index.lines) == 8
+    assert (0, 1, 2) in index.lines
+    assert (0, 3, 6) in index.lines
+    assert (0, 4, 8) in index.lines
+    assert (6, 4, 2) in index.lines
+    assert len(line_index(4).lines) == 10
+
+def test_masks():
+    index = line_index(3)
+    assert index.masks == tuple([to_mask(line) for line in index.lines])
+    assert 0b100010001 in index.masks
+    assert 0b001010100 in index.masks
+
+def test_cell_lines():
+    index = line_index(3)
+    assert len(index.cell_lines[4]) == 4
+    assert len(index.cell_lines[0]) == 3
+    assert len(index.cell_lines[1]) == 2
+    assert all([len(index.cell_lines[i]) == len(index.cell_masks[i])
+        for i in range(9)])
+
+def test_win_length(monkeypatch):
+    assert win_length(5) == 5
+    monkeypatch.setattr(config, 'win_length', 4)
+    assert win_length(5) == 4
+    assert win_length(3) == 3
+    assert line_index(5) is line_index(5, 4)
+    assert line_index(5) is not line_index(5, 5)
+
+def test_full_lines_unchanged():
+    # The lines of the classic rules keep their order.
+    index = line_index(4, 4)
+    assert index.lines[0] == (0, 1, 2, 3)
+    assert index.lines[4] == (0, 4, 8, 12)
+    assert index.lines[8] == (0, 5, 10, 15)
+    assert index.lines[9] == (12, 9, 6, 3)
+
+def test_k_in_a_row_lines():
+    index = line_index(5, 4)
+    # 2 windows in each row and column and 4 along each diagonal direction.
+    assert len(index.lines) == 5 * 2 * 2 + 4 * 2
+    assert (1, 2, 3, 4) in index.lines
+    assert (5, 11, 17, 23) in index.lines
+    assert (16, 12, 8, 4) in index.lines
+    assert all([len(line) == 4 for line in index.lines])
+    # Three in a row on 5x5 includes the short diagonals.
+    assert (2, 8, 14) in line_index(5, 3).lines
+    assert (10, 6, 2) in line_index(5, 3).lines
@@ -0,0 +1,84 @@
+from logging import DEBUG
+from logging import INFO
+from logging import WARNING
+from threading import Event
+
+from pytest import fixture
+
+from common import log
+from common.log import OFF
+from common.log import BufferedSink
+from common.log import Loggable
+from common.log import ModuleLogger
+from common.log import buffer_log
+from common.log import unbuffer_log
+
+class Unformattable(object):
+    def __format__(self, spec):
+        raise AssertionError('formatted a disabled message')
+
+@fixture
+def messages(monkeypatch):
+    messages = []
+    monkeypatch.setattr(log.log, 'msg',
+        lambda msg, logLevel: messages.append((msg, logLevel)))
+    yield messages
+    log.set_level(INFO)
+
+def test_levels(messages):
+    log.set_level('WARNING')
+    assert log.enabled(WARNING) and not log.enabled(INFO)
+    Loggable().info('{value}', value=Unformattable())
+    Loggable().warn('cell {index}', index=3)
+    assert messages == [('Loggable: cell 3', WARNING)]
+
+def test_off(messages):
+    log.set_level(OFF)
+    assert not log.enabled(DEBUG)
+    Loggable().crit('{value}', value=Unformattable())
+    assert messages == []
+
+def test_module_logger(messages):
+    ModuleLogger().info('started')
+    ModuleLogger('server.main').info('started')
+    assert messages == [
+        ('test_log: started', INFO), ('server.main: started', INFO)]
+
+def test_buffered_sink():
+    written = []
+    sink = BufferedSink(written.append, 4, 60)
+    for i in range(6):
+        sink.emit({'message': (str(i),)})
+    assert sink.dropped == 2
+    assert written == []
+    sink.flush()
+    assert [event['message'] for event in written] == [
+        ('0',), ('1',), ('2',), ('3',)]
+
+def test_buffered_sink_thread():
+    written = []
+    batch_written = Event()
+    def write(event):
+        written.append(event)
+        if len(written) == 2:
+            batch_written.set()
+    sink = BufferedSink(write, 4, 60)
+    sink.start()
+    sink.emit({'message': ('0',)})
+    # Half full: the writer wakes without waiting for the 60s interval.  The
+    # timeout only bounds a failing run.
+    sink.emit({'message': ('1',)})
+    assert batch_written.wait(30)
+    assert len(written) == 2
+    sink.emit({'message': ('2',)})
+    sink.stop()
+    assert len(written) == 3 and not sink.thread.is_alive()
+
+def test_buffer_log():
+    written = []
+    sink = buffer_log(16, 60)
+    sink.observer = written.append
+    ModuleLogger().info('queued')
+    assert written == []
+    unbuffer_log(sink)
+    assert written[0]['message'] == ('test_log: queued',)
@@ -0,0 +1,66 @@
+from twisted.internet.defer import Deferred
+
+from server.metrics import Metrics
+from server.metrics import Summary
+from server.metrics import format_labels
+
+class Request(object):
+    def __init__(self):
+        self.finished = Deferred()
+
+    def notifyFinish(self):
+        return self.finished
+
+def test_format_labels():
+    assert format_labels(()) == ''
+    assert format_labels((('a', 1), ('b', 'x'))) == '{a="1",b="x"}'
+
+def test_summary():
+    summary = Summary(window=100)
+    assert summary.quantile(0.5) is None
+    for value in range(1, 201):
+        summary.observe(value)
+    assert (summary.count, summary.total) == (200, 20100)
+    # The window holds 101 to 200.
+    assert summary.quantile(0.5) == 150
+    assert summary.quantile(0.95) == 195
+    assert summary.quantile(0.99) == 199
+    assert summary.quantile(1) == 200
+    assert summary.quantile(0) == 101
+
+def test_summary_nearest_rank():
+    summary = Summary(window=10)
+    for value in [15, 20, 35, 40, 50]:
+        summary.observe(value)
+    assert summary.quantile(0.3) == 20
+    assert summary.quantile(0.4) == 20
+    assert summary.quantile(0.5) == 35
+    assert summary.quantile(1) == 50
+
+def test_track():
+    times = [1.0]
+    metrics = Metrics()
+    request = Request()
+    metrics.track(request, lambda: times[0])
+    assert metrics.in_flight == 1
+    times[0] = 1.25
+    request.finished.callback(None)
+    assert metrics.in_flight == 0
+    assert list(metrics.latency.samples) == [0.25]
+
+def test_render():
+    metrics = Metrics()
+    metrics.count('move', 3)
+    metrics.count('move', 4)
+    metrics.count('move', 4)
+    metrics.nodes.observe(10)
+    metrics.gauge('ttt_answer', 'The answer.', lambda: 42)
+    lines = metrics.render().splitlines()
+    assert 'ttt_requests_total{endpoint="move",side_len="3"} 1' in lines
+    assert 'ttt_requests_total{endpoint="move",side_len="4"} 2' in lines
+    assert 'ttt_requests_in_flight 0' in lines
+    assert 'ttt_request_latency_seconds{quantile="0.5"} NaN' in lines
+    assert 'ttt_search_nodes{quantile="0.99"} 10' in lines
+    assert 'ttt_search_nodes_count 1' in lines
+    assert '# TYPE ttt_answer gauge' in lines
+    assert 'ttt_answer 42' in lines
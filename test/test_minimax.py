@@ -0,0 +1,103 @@
+from common.model.bitboard import from_string
+from common.model.bitboard import to_string
+from server.ai.minimax import SearchStats
+from server.ai.minimax import best_move
+from server.ai.minimax import best_move_with_stats
+from server.ai.minimax import iterative_deepening
+from server.ai.minimax import max_depth
+from server.ai.minimax import Search
+from server.ai.ordering import MoveOrderer
+from server.ai.transposition import TranspositionTable
+
+def test_best_move_wins():
+    assert to_string(best_move(from_string('XX OO    '))) == 'XXXOO    '
+
+def test_best_move_blocks():
+    assert to_string(best_move(from_string('OO  X   X'))) == 'OOX X   X'
+
+def test_best_move_leaf():
+    assert to_string(best_move(from_string('XXX   OO '))) == 'XXX   OO '
+    assert to_string(best_move(from_string('XXOOOXXOX'))) == 'XXOOOXXOX'
+
+def test_search_restores_board():
+    for board_string in ['         ', 'X   O    ', 'X    O          ']:
+        board = from_string(board_string)
+        Search(board, max_depth(board)).run()
+        assert to_string(board) == board_string
+
+def test_search_score():
+    board = from_string('         ')
+    assert Search(board, max_depth(board)).run()[0] == 0.0
+    board = from_string('XX OO    ')
+    assert Search(board, max_depth(board)).run() == (1.0, 2)
+
+def test_search_with_table():
+    board = from_string('         ')
+    plain = Search(board, max_depth(board))
+    cached = Search(board, max_depth(board), TranspositionTable(2 ** 12))
+    assert plain.run()[0] == cached.run()[0]
+    assert cached.nodes < plain.nodes
+    assert to_string(board) == '         '
+
+def test_search_symmetry():
+    for board_string in ['         ', 'X   O    ', '     X          ']:
+        board = from_string(board_string)
+        plain = Search(board, max_depth(board), TranspositionTable(2 ** 12), False)
+        reduced = Search(board, max_depth(board), TranspositionTable(2 ** 12))
+        assert plain.run()[0] == reduced.run()[0]
+        assert reduced.nodes < plain.nodes
+
+def test_iterative_deepening():
+    board = from_string(' ' * 16)
+    score, move, plies = iterative_deepening(board, 0)
+    assert plies >= 1
+    assert move in board.empty_cells()
+    assert to_string(board) == ' ' * 16
+
+    board = from_string('XXO OOX X   O   ')
+    score, move, plies = iterative_deepening(board, 10 ** 6)
+    assert plies == len(board.empty_cells())
+
+def test_iterative_deepening_wins():
+    board = from_string('XXX OO  O       ')
+    assert iterative_deepening(board, 10 ** 6)[:2] == (1.0, 3)
+
+def test_search_with_orderer():
+    board = from_string('         ')
+    plain = Search(board, max_depth(board), TranspositionTable(2 ** 12))
+    ordered = Search(board, max_depth(board), TranspositionTable(2 ** 12),
+        orderer=MoveOrderer(3))
+    assert plain.run()[0] == ordered.run()[0]
+    assert ordered.nodes < plain.nodes
+
+def test_best_move_with_stats():
+    position, stats = best_move_with_stats(from_string('XX OO    '))
+    assert to_string(position) == 'XXXOO    '
+    # Five empty cells: the game cannot last more than five plies.
+    assert (stats.score, stats.move, stats.depth) == (1.0, 2, 5)
+    assert stats.nodes >= 1
+    assert stats.probes >= stats.hits >= 0
+
+    position, stats = best_move_with_stats(from_string('XXX   OO '))
+    assert to_string(position) == 'XXX   OO '
+    assert stats.move is None and stats.nodes == 0
+
+def test_search_stats():
+    board = from_string('X    O          ')
+    stats = SearchStats()
+    search = Search(board, 2, TranspositionTable(2 ** 12),
+        orderer=MoveOrderer(4), stats=stats)
+    assert search.run() == Search(board, 2, TranspositionTable(2 ** 12),
+        orderer=MoveOrderer(4)).run()
+    assert stats.nodes == search.nodes
+    assert stats.heuristic == stats.leaves > 0
+    assert sum(stats.beta_cutoffs) > 0
+    assert stats.probes == search.table.hits + search.table.misses
+    assert stats.as_dict()['nodes'] == stats.nodes
+
+def test_iterative_deepening_stats():
+    board = from_string(' ' * 16)
+    stats = SearchStats()
+    score, move, plies = iterative_deepening(board, 50, stats=stats)
+    assert stats.nodes > 0
+    assert len(stats.beta_cutoffs) <= board.size()
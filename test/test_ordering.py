@@ -0,0 +1,38 @@
+from common.model.bitboard import from_string
+from server.ai.ordering import MoveOrderer
+from server.ai.ordering import static_priors
+
+def order(board_string, ply=0, tt_move=None, orderer=None):
+    board = from_string(board_string)
+    orderer = orderer or MoveOrderer(board.side_len())
+    if board.x_has_next_turn():
+        own, other = board.x_bits, board.o_bits
+    else:
+        own, other = board.o_bits, board.x_bits
+    return orderer.order(own, other, board.empty_cells(), ply, tt_move)
+
+def test_static_priors():
+    assert static_priors(3) == [3, 2, 3, 2, 4, 2, 3, 2, 3]
+
+def test_empty_board():
+    moves = order('         ')
+    assert moves[0] == 4
+    assert set(moves[1:5]) == set([0, 2, 6, 8])
+
+def test_tt_move_first():
+    assert order('         ', tt_move=7)[0] == 7
+
+def test_win_then_block():
+    # X to move: 2 wins, 5 blocks.
+    moves = order('XX OO    ')
+    assert moves[:2] == [2, 5]
+
+def test_killers_and_history():
+    orderer = MoveOrderer(3)
+    orderer.cutoff(1, 2, 3)
+    assert orderer.killers[2] == [1, None]
+    assert orderer.history[1] == 9
+    assert order('         ', ply=2, orderer=orderer)[0] == 1
+    assert order('         ', ply=3, orderer=orderer)[0] == 1
+    orderer.cutoff(7, 2, 1)
+    assert orderer.killers[2] == [7, 1]
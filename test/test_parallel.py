@@ -0,0 +1,32 @@
+from pytest import fixture
+
+from common import config
+from common.model.bitboard import from_string
+from common.model.bitboard import to_string
+from server.ai.evaluation import evaluator
+from server.ai.minimax import Search
+from server.ai.parallel import ParallelSearch
+from server.ai.transposition import TranspositionTable
+
+@fixture(scope='module')
+def parallel():
+    parallel = ParallelSearch(2)
+    yield parallel
+    parallel.close()
+
+def test_matches_sequential(parallel):
+    for board_string, max_depth in [
+            ('         ', 9),
+            ('X        ', 9),
+            (' ' * 16, 3),
+            ('X    O          ', 4),
+            ('XO  OX  X   O   ', 6)]:
+        board = from_string(board_string)
+        sequential = Search(board, max_depth, TranspositionTable(2 ** 16),
+            evaluator=evaluator(board, config.heuristic)).run()
+        assert parallel.run(board, max_depth) == sequential
+        assert to_string(board) == board_string
+
+def test_iterative_deepening(parallel):
+    board = from_string('XXX OO  O       ')
+    assert parallel.iterative_deepening(board, 10 ** 6)[:2] == (1.0, 3)
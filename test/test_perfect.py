@@ -0,0 +1,43 @@
+from common.model.bitboard import from_string
+from server.ai.minimax import MAX_DEPTH_SMALL_BOARD
+from server.ai.minimax import Search
+from server.ai.perfect import PerfectTable
+from server.ai.perfect import position_number
+from server.ai.perfect import reachable
+
+def test_position_number():
+    assert position_number('         ') == 0
+    assert position_number('X        ') == 1
+    assert position_number('O        ') == 2
+    assert position_number(' X       ') == 3
+    assert position_number('OOOOOOOOO') == 3 ** 9 - 1
+
+def test_reachable():
+    positions = set()
+    reachable('         ', positions)
+    assert len(positions) == 4520
+    assert 'XXX   OO ' not in positions
+
+def test_lookup():
+    table = PerfectTable()
+    assert table.lookup('XXX   OO ') is None
+    assert table.lookup('XXOOOXXOX') is None
+    assert table.lookup('XX OO    ') == 2
+    assert table.lookup('OO  X   X') == 2
+
+def test_lookup_is_perfect():
+    table = PerfectTable()
+    positions = set()
+    reachable('X   O    ', positions)
+    for string in positions:
+        move = table.lookup(string)
+        board = from_string(string)
+        board.play(move)
+        if board.is_win_at(move):
+            score = 1.0
+        elif board.is_draw():
+            score = 0.0
+        else:
+            score = -Search(board, MAX_DEPTH_SMALL_BOARD).run()[0]
+        assert score == Search(
+            from_string(string), MAX_DEPTH_SMALL_BOARD).run()[0]
@@ -0,0 +1,146 @@
+import json
+from io import BytesIO
+
+from twisted.web.server import NOT_DONE_YET
+from twisted.web.test.requesthelper import DummyRequest
+
+from common import config
+from common import wire
+from common.model import bitboard as board
+from server import main
+
+def get(board_string, etag=None):
+    request = DummyRequest([''])
+    request.args = {'board': [board_string]}
+    if etag:
+        request.requestHeaders.setRawHeaders('if-none-match', [etag])
+    body = main.root().getChildWithDefault('', request).render_GET(request)
+    return body, request
+
+def post(path, body, content_type=None):
+    request = DummyRequest([path])
+    request.method = 'POST'
+    request.content = BytesIO(body)
+    if content_type:
+        request.requestHeaders.setRawHeaders('content-type', [content_type])
+    return main.root().getChildWithDefault(path, request).render_POST(request)
+
+def test_find_move():
+    assert main.find_move('XX OO    ') == 'XXXOO    '
+    assert main.find_move('XXX   OO ') == 'XXX   OO '
+    assert main.find_move('XXX OO  O       ') == 'XXXXOO  O       '
+
+def test_get():
+    body, request = get('XX OO    ')
+    assert body == 'XXXOO    '
+    assert request.responseHeaders.getRawHeaders('cache-control') ==\
+        ['public, max-age={0}'.format(config.http_max_age)]
+
+def test_get_cached():
+    hits = main.response_cache.hits
+    get('OO  X   X')
+    assert get('OO  X   X')[0] == 'OOX X   X'
+    assert main.response_cache.hits == hits + 1
+
+def test_get_conditional():
+    body, request = get('XX OO    ')
+    etag = request.responseHeaders.getRawHeaders('etag')[0]
+    body, request = get('XX OO    ', etag)
+    assert body == ''
+    assert request.responseCode == 304
+    body, request = get('XX OO    ', '"stale"')
+    assert body == 'XXXOO    '
+
+def test_find_moves():
+    assert main.find_moves(['XX OO    ', 'OO  X   X', 'XX OO    ']) ==\
+        ['XXXOO    ', 'OOX X   X', 'XXXOO    ']
+
+def test_batch_lines():
+    assert post('batch', 'XX OO    \nOO  X   X\n') ==\
+        'XXXOO    \nOOX X   X\n'
+
+def test_batch_json():
+    body = json.dumps(['XX OO    ', 'XXX   OO '])
+    assert json.loads(post('batch', body, 'application/json')) ==\
+        ['XXXOO    ', 'XXX   OO ']
+
+def post_invalid(body, content_type):
+    request = DummyRequest(['batch'])
+    request.method = 'POST'
+    request.content = BytesIO(body)
+    request.requestHeaders.setRawHeaders('content-type', [content_type])
+    resource = main.root().getChildWithDefault('batch', request)
+    return resource.render_POST(request), request.responseCode
+
+def test_batch_invalid_json():
+    assert post_invalid('["XX OO    "', 'application/json') == ('', 400)
+
+def test_batch_not_a_list():
+    assert post_invalid('{"board": "XX OO    "}', 'application/json') ==\
+        ('', 400)
+    assert post_invalid('[1, 2]', 'application/json') == ('', 400)
+
+def test_move_index():
+    assert main.move_index('XX OO    ', 'XXXOO    ') == 2
+    assert main.move_index('XXX   OO ', 'XXX   OO ') is None
+
+def test_packed():
+    body = ''.join([wire.pack(board.from_string(board_string))
+        for board_string in ['XX OO    ', 'XXX   OO ', 'OO  X   X']])
+    assert wire.unpack_moves(post('packed', body)) == [2, None, 2]
+
+def test_find_positions():
+    positions = [board.from_string(board_string)
+        for board_string in ['XX OO    ', 'XXX   OO ', 'XXX OO  O       ']]
+    moves = main.find_positions(positions)
+    assert [board.to_string(move) for move in moves] ==\
+        ['XXXOO    ', 'XXX   OO ', 'XXXXOO  O       ']
+    assert [main.position_move_index(position, move)
+        for position, move in zip(positions, moves)] == [2, None, 3]
+    # The requested boards are left unchanged.
+    assert board.to_string(positions[0]) == 'XX OO    '
+
+def test_cheap_position():
+    position = board.from_string('X               ')
+    assert main.cheap_position(position) is None
+    assert board.to_string(main.cheap_position(
+        board.from_string('XX OO    '))) == 'XXXOO    '
+
+def test_packed_invalid():
+    request = DummyRequest(['packed'])
+    request.method = 'POST'
+    request.content = BytesIO('\x03\x00')
+    resource = main.root().getChildWithDefault('packed', request)
+    assert resource.render_POST(request) == ''
+    assert request.responseCode == 400
+
+def test_cheap_move():
+    assert main.cheap_move('XX OO    ') == 'XXXOO    '
+    assert main.cheap_move('XXX   OO ') == 'XXX   OO '
+    assert main.cheap_move('XXXXOO  O  O  O ') == 'XXXXOO  O  O  O '
+    assert main.cheap_move('X               ') is None
+
+def test_get_deferred():
+    request = DummyRequest([''])
+    request.args = {'board': ['X               ']}
+    resource = main.root().getChildWithDefault('', request)
+    assert resource.render_GET(request) == NOT_DONE_YET
+
+def test_metrics():
+    get('XX OO    ')
+    main.find_move('X               ')
+    request = DummyRequest(['metrics'])
+    body = main.root().getChildWithDefault('metrics', request)\
+        .render_GET(request)
+    lines = body.splitlines()
+    assert any([line.startswith('ttt_requests_total{endpoint="move",'
+        'side_len="3"}') for line in lines])
+    assert any([line.startswith('ttt_search_nodes_count ')
+        for line in lines])
+    assert any([line.startswith('ttt_transposition_bytes ')
+        for line in lines])
+    assert main.metrics.nodes.samples[-1] > 1
+
+def test_batch_crlf():
+    assert post('batch', 'XX OO    \r\nOO  X   X\r\n') ==\
+        'XXXOO    \nOOX X   X\n'
@@ -0,0 +1,207 @@
+from threading import Event
+
+from pytest import raises
+from twisted.internet.defer import Deferred
+from twisted.internet.defer import maybeDeferred
+from twisted.internet.testing import StringTransport
+
+from common import config
+from common.model.bitboard import to_string
+from server.ai.transposition import position_key
+from server.session import Session
+from server.session import SessionError
+from server.session import SessionFactory
+
+def connect(search=maybeDeferred):
+    protocol = SessionFactory(search).buildProtocol(None)
+    transport = StringTransport()
+    protocol.makeConnection(transport)
+    return protocol, transport
+
+def send(protocol, transport, line):
+    transport.clear()
+    protocol.dataReceived(line + '\n')
+    return transport.value().splitlines()
+
+def test_session():
+    session = Session(3)
+    session.play(0)
+    move = session.reply()
+    assert to_string(session.position)[move] == 'O'
+    assert to_string(session.position).count(' ') == 7
+    assert len(session.table) > 0
+    with raises(SessionError):
+        session.play(move)
+
+def test_session_reuses_table():
+    session = Session(4)
+    table = session.table
+    session.play(5)
+    position = session.position
+    key = position_key(position.x_bits, position.o_bits, 16)
+    session.reply()
+    assert table.probe(key) is not None
+    session.play(session.position.empty_cells()[0])
+    session.reply()
+    assert session.table is table
+    # The position searched on the first turn is still known on the second.
+    assert session.table.probe(key) is not None
+
+def test_play():
+    protocol, transport = connect()
+    assert send(protocol, transport, 'new 3') == ['ok']
+    assert send(protocol, transport, 'play 0') == ['move 4']
+    assert to_string(protocol.session.position) == 'X   O    '
+
+def test_go():
+    protocol, transport = connect()
+    send(protocol, transport, 'new 4')
+    reply = send(protocol, transport, 'go')
+    assert reply[0].startswith('move ')
+    move = int(reply[0].split()[1])
+    assert to_string(protocol.session.position)[move] == 'X'
+
+def test_play_to_the_end():
+    protocol, transport = connect()
+    send(protocol, transport, 'new 3')
+    reply = ['move']
+    while reply[0].startswith('move'):
+        position = protocol.session.position
+        if position.is_leaf_and_score()[0]:
+            break
+        reply = send(protocol, transport,
+            'play {0}'.format(position.empty_cells()[0]))
+    assert protocol.session.position.is_leaf_and_score()[0]
+    assert send(protocol, transport, 'go') == ['over']
+
+def test_errors():
+    protocol, transport = connect()
+    assert send(protocol, transport, 'play 0') == ['error no game']
+    assert send(protocol, transport, 'new 99') ==\
+        ['error invalid side length 99']
+    assert send(protocol, transport, 'jump')[0] == 'error unknown command'
+    send(protocol, transport, 'new 3')
+    assert send(protocol, transport, 'play x')[0].startswith('error')
+    assert send(protocol, transport, 'play 0') == ['move 4']
+    assert send(protocol, transport, 'play 4') == ['error invalid move 4']
+    assert send(protocol, transport, 'play 9') == ['error invalid move 9']
+
+def test_busy():
+    searches = []
+    def search(func):
+        searches.append((Deferred(), func))
+        return searches[-1][0]
+    protocol, transport = connect(search)
+    send(protocol, transport, 'new 3')
+    assert send(protocol, transport, 'play 0') == []
+    assert send(protocol, transport, 'play 1') == ['error busy']
+    deferred, func = searches[0]
+    transport.clear()
+    deferred.callback(func())
+    assert transport.value() == 'move 4\n'
+    assert send(protocol, transport, 'play 1') == []
+    assert len(searches) == 2
+
+def test_disconnect_while_searching():
+    searches = []
+    def search(func):
+        searches.append((Deferred(), func))
+        return searches[-1][0]
+    pondering = []
+    def ponder(func, *args):
+        pondering.append(func)
+        return Deferred()
+    protocol = SessionFactory(search, ponder).buildProtocol(None)
+    transport = StringTransport()
+    protocol.makeConnection(transport)
+    send(protocol, transport, 'new 4')
+    assert send(protocol, transport, 'go') == []
+    protocol.connectionLost(None)
+    transport.clear()
+    deferred, func = searches[0]
+    deferred.callback(func())
+    assert transport.value() == ''
+    assert pondering == []
+
+def test_ponder(monkeypatch):
+    monkeypatch.setattr(config, 'search_budget_ms', 20)
+    monkeypatch.setattr(config, 'ponder_budget_ms', 100)
+    session = Session(4)
+    session.play(5)
+    session.reply()
+    pondered = {}
+    session.ponder(session.position.copy(), Event(), pondered)
+    assert 0 < len(pondered) <= 5
+    for move, reply in pondered.items():
+        assert move in session.position.empty_cells()
+        assert reply in session.position.empty_cells() and reply != move
+
+def test_ponder_stops():
+    session = Session(4)
+    session.play(5)
+    cancelled = Event()
+    cancelled.set()
+    pondered = {}
+    session.ponder(session.position.copy(), cancelled, pondered)
+    assert pondered == {}
+    session = Session(3)
+    session.play(4)
+    session.ponder(session.position.copy(), Event(), pondered)
+    assert pondered == {}
+
+def test_pondered_reply(monkeypatch):
+    monkeypatch.setattr(config, 'search_budget_ms', 20)
+    monkeypatch.setattr(config, 'ponder_budget_ms', 100)
+    searches = []
+    def search(func):
+        searches.append(func)
+        return maybeDeferred(func)
+    protocol = SessionFactory(search, maybeDeferred).buildProtocol(None)
+    transport = StringTransport()
+    protocol.makeConnection(transport)
+    send(protocol, transport, 'new 4')
+    send(protocol, transport, 'go')
+    pondered = protocol.session.pondered
+    assert pondered
+    move, reply = sorted(pondered.items())[0]
+    assert send(protocol, transport, 'play {0}'.format(move)) ==\
+        ['move {0}'.format(reply)]
+    assert len(searches) == 1
+    # The next turn is pondered afresh.
+    assert protocol.session.pondered is not pondered
+
+def test_queued_ponder_does_not_delay_search(monkeypatch):
+    monkeypatch.setattr(config, 'search_budget_ms', 20)
+    queued = []
+    def ponder(func, *args):
+        # A busy pool: the pondering is queued but never started.
+        queued.append((func, args))
+        return Deferred()
+    protocol = SessionFactory(maybeDeferred, ponder).buildProtocol(None)
+    transport = StringTransport()
+    protocol.makeConnection(transport)
+    send(protocol, transport, 'new 4')
+    assert send(protocol, transport, 'go')[0].startswith('move ')
+    assert len(queued) == 1
+    move = protocol.session.position.empty_cells()[0]
+    assert send(protocol, transport, 'play {0}'.format(move))[0]\
+        .startswith('move ')
+    assert len(queued) == 2
+    # Started late, the cancelled pondering returns at once.
+    func, args = queued[0]
+    func(*args)
+    assert args[2] == {}
+
+def test_ponder_session_budget(monkeypatch):
+    monkeypatch.setattr(config, 'search_budget_ms', 20)
+    monkeypatch.setattr(config, 'ponder_budget_ms', 100)
+    monkeypatch.setattr(config, 'ponder_session_budget_ms', 100)
+    session = Session(4)
+    session.play(5)
+    session.reply()
+    session.ponder(session.position.copy(), Event(), {})
+    assert session.pondered_seconds > 0
+    session.pondered_seconds = 0.1
+    pondered = {}
+    session.ponder(session.position.copy(), Event(), pondered)
+    assert pondered == {}
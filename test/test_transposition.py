@@ -0,0 +1,70 @@
+from pytest import raises
+
+from server.ai.transposition import DEPTH_PREFERRED
+from server.ai.transposition import ENTRY_BYTES
+from server.ai.transposition import EXACT
+from server.ai.transposition import LOWER
+from server.ai.transposition import LRU
+from server.ai.transposition import SLOT_BYTES
+from server.ai.transposition import TranspositionTable
+from server.ai.transposition import capacity_for
+from server.ai.transposition import position_key
+
+def test_position_key():
+    assert position_key(0, 0, 9) != position_key(0, 0, 16)
+    assert position_key(1, 2, 9) != position_key(2, 1, 9)
+
+def test_unknown_policy():
+    with raises(ValueError):
+        TranspositionTable(8, 'random')
+
+def test_probe_and_store():
+    for policy in [DEPTH_PREFERRED, LRU]:
+        table = TranspositionTable(8, policy)
+        assert table.probe(1) is None
+        table.store(1, 3, EXACT, 0.5, 4)
+        table.store(1, 4, LOWER, 1.0, 2)
+        assert table.probe(1) == (4, LOWER, 1.0, 2)
+        assert len(table) == 1
+        assert (table.hits, table.misses) == (1, 1)
+
+def test_lru_eviction():
+    table = TranspositionTable(2, LRU)
+    table.store(1, 1, EXACT, 0.0, 0)
+    table.store(2, 1, EXACT, 0.0, 0)
+    table.probe(1)
+    table.store(3, 1, EXACT, 0.0, 0)
+    assert len(table) == 2
+    assert table.evictions == 1
+    assert table.probe(2) is None
+    assert table.probe(1) is not None
+
+def test_depth_preferred_replacement():
+    table = TranspositionTable(1, DEPTH_PREFERRED)
+    table.store(1, 5, EXACT, 0.0, 0)
+    table.store(2, 3, EXACT, 0.0, 0)
+    assert table.probe(2) is None
+    assert table.evictions == 0
+    table.store(2, 5, EXACT, 0.0, 0)
+    assert table.probe(2) is not None
+    assert table.probe(1) is None
+    assert table.evictions == 1
+    assert len(table) == 1
+
+def test_memory():
+    for policy in [DEPTH_PREFERRED, LRU]:
+        table = TranspositionTable(8, policy)
+        empty = table.memory()
+        table.store(1, 3, EXACT, 0.5, 4)
+        assert table.memory() == empty + ENTRY_BYTES
+
+def test_capacity_for():
+    assert capacity_for(0) == 1
+    capacity = capacity_for(2 ** 20)
+    assert capacity * (ENTRY_BYTES + SLOT_BYTES) <= 2 ** 20
+    assert (capacity + 1) * (ENTRY_BYTES + SLOT_BYTES) > 2 ** 20
+    table = TranspositionTable(capacity)
+    for key in range(capacity):
+        table.store(key, 1, EXACT, 0.5, 0)
+    assert len(table) == capacity
+    assert table.memory() <= 2 ** 20 + 2 ** 10
@@ -0,0 +1,71 @@
+from random import Random
+
+from pytest import importorskip
+
+importorskip('numpy')
+
+from common.model.bitboard import blank
+from common.model.bitboard import from_string
+from server.ai import vectorized
+from server.ai.minimax import Search
+
+from test_board import board_string_list
+
+def random_boards(side_len, count, seed=0):
+    random = Random(seed)
+    boards = []
+    for i in range(count):
+        board = blank(side_len)
+        moves = random.sample(board.empty_cells(), min(12, board.size()))
+        for move in moves[:random.randint(0, len(moves))]:
+            board.play(move)
+        # Random boards may hold wins that are not through the last move.
+        board.last = None
+        boards.append(board)
+    return boards
+
+def test_incidence():
+    matrix = vectorized.incidence(3)
+    assert matrix.shape == (9, 8)
+    assert list(matrix.sum(axis=0)) == [3] * 8
+    assert list(matrix.sum(axis=1)) == [3, 2, 3, 2, 4, 2, 3, 2, 3]
+
+def test_unpack():
+    assert list(vectorized.unpack(0b101, 9)) == [1, 0, 1, 0, 0, 0, 0, 0, 0]
+    assert list(vectorized.unpack(1 << 63, 64)) == [0] * 63 + [1]
+
+def test_encode():
+    cells = vectorized.encode([from_string('XO X     ')])
+    assert cells.shape == (1, 9)
+    assert list(cells[0]) == [1, -1, 0, 1, 0, 0, 0, 0, 0]
+
+def test_evaluate():
+    boards = [from_string(board_string) for board_string in board_string_list
+        if len(board_string) == 9]
+    boards += random_boards(3, 50)
+    for side_len in range(4, 9):
+        boards += random_boards(side_len, 20)
+
+    for side_len in range(3, 9):
+        batch = [board for board in boards if board.side_len() == side_len]
+        wins, draws, scores = vectorized.evaluate(
+            vectorized.encode(batch), side_len)
+        for board, win, draw, score in zip(batch, wins, draws, scores):
+            assert win == board.is_win()
+            assert draw == (board.is_draw() and not win)
+            assert score == board.heur_score()
+
+def test_best_child():
+    board = from_string('XX OO    ')
+    assert vectorized.best_child(board, board.empty_cells(), True) == (1.0, 2)
+    board = from_string('XOXXOOOX ')
+    assert vectorized.best_child(board, [8], True) == (0.0, 8)
+
+def test_vectorized_search():
+    for board in random_boards(5, 10) + random_boards(6, 5):
+        if board.is_leaf_and_score()[0]:
+            continue
+        for max_depth in range(3):
+            expected = Search(board.copy(), max_depth).run()
+            assert Search(board.copy(), max_depth,
+                vectorized=True).run()[0] == expected[0]
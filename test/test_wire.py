@@ -0,0 +1,46 @@
+from pytest import raises
+
+from common import wire
+from common.model.bitboard import from_string
+from common.model.bitboard import to_string
+
+from test_board import board_string_list
+
+def test_pack_unpack():
+    for board_string in board_string_list:
+        data = wire.pack(from_string(board_string))
+        position, end = wire.unpack(data)
+        assert to_string(position) == board_string
+        assert end == len(data)
+
+def test_pack_size():
+    assert len(wire.pack(from_string('X' * 9))) == 1 + 2 * 2
+    assert len(wire.pack(from_string('XO' * 32))) == 1 + 2 * 8
+    assert wire.pack(from_string('X   O    ')) == '\x03\x00\x01\x00\x10'
+
+def test_unpack_all():
+    board_strings = ['XX OO    ', 'X               ', ' ' * 64]
+    data = ''.join([wire.pack(from_string(board_string))
+        for board_string in board_strings])
+    assert [to_string(position) for position in wire.unpack_all(data)] ==\
+        board_strings
+    assert wire.unpack_all('') == []
+
+def test_unpack_invalid():
+    data = wire.pack(from_string('XX OO    '))
+    with raises(ValueError):
+        wire.unpack_all(data[:-1])
+    with raises(ValueError):
+        wire.unpack_all('\x00')
+    with raises(ValueError):
+        wire.unpack_all('\x10' + data[1:])
+    # A cell taken by both players.
+    with raises(ValueError):
+        wire.unpack_all('\x03\x00\x01\x00\x01')
+    # A cell beyond the board.
+    with raises(ValueError):
+        wire.unpack_all('\x03\x02\x00\x00\x00')
+
+def test_pack_moves():
+    assert wire.pack_moves([0, 8, None]) == '\x00\x08\xff'
+    assert wire.unpack_moves('\x00\x08\xff') == [0, 8, None]